@@ -47,6 +47,7 @@ AGENTS:
 COMMUNICATION PATTERNS:
 -----------------------
 - PUB-SUB: Operators broadcast auction items and sale confirmations to all merchants
+  (item prices on a conflated channel that only keeps the latest price per operator)
 - PUSH-PULL: Merchants send targeted buy requests to specific operators
 
 MESSAGE FLOW EXAMPLE:
@@ -77,17 +78,48 @@ OUTPUT FILES:
 # ============================================================================
 import time
 import csv
-import random
 import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import numpy as np
+import zmq
+import msgpack
+import cloudpickle
+from numba import njit
 from osbrain import run_agent, run_nameserver, Agent
+from osbrain.address import AgentAddress
 import osbrain
 
 # ============================================================================
 # SYSTEM CONFIGURATION
 # ============================================================================
-# Set osBrain to use JSON for message serialization (allows complex data structures)
-osbrain.config['SERIALIZER'] = 'json'
+# Set osBrain's default serializer to pickle (its native serializer) for any socket
+# that does not choose its own: faster and more compact than JSON for small dicts
+osbrain.config['SERIALIZER'] = 'pickle'
+
+# The auction channels (market, prices, sales) are bound as 'raw' sockets and carry
+# msgpack-encoded dicts instead (~3x smaller than pickle, faster to decode).
+# Agents pack with msgpack.packb before sending and unpack in their handlers;
+# osBrain has no msgpack serializer of its own, hence 'raw'.
+# (Buy requests on the sales channel are a fixed struct instead, see BUY_REQUEST.)
+WIRE_SERIALIZER = 'raw'
+
+# ---- MARKET MESSAGE PROTOCOL ----
+# Messages broadcast on the market (PUB) channel use short keys and an integer tag:
+#   't': message tag (MSG_AUCTION_ITEM or MSG_SALE_CONFIRMATION)
+#   'o': operator_id    'p': product_id    'k': product type code (TYPE_IDX slot: 0=H, 1=S, 2=T)
+#   'x': price          'm': merchant_id (winner, SALE_CONFIRMATION only)
+MSG_AUCTION_ITEM = 1           # Item broadcast (current price of current item)
+MSG_SALE_CONFIRMATION = 2      # Item sold to merchant 'm' for price 'x'
+
+# Buy requests (merchant -> operator, sales channel) always carry the same three
+# integers, so they travel as a fixed 12-byte struct instead of a msgpack dict:
+#   operator_id, product_id, merchant_id (little-endian uint32)
+# (A format string rather than a struct.Struct: agent classes are cloudpickled
+# with the globals they use, and Struct objects cannot be pickled; the struct
+# module caches the compiled format anyway.)
+BUY_REQUEST = '<III'
 
 # ============================================================================
 # SIMULATION PARAMETERS
@@ -97,6 +129,28 @@ NUM_MERCHANTS = 3              # Number of buyers in the auction
 FISH_TYPES = ['H', 'S', 'T']   # H=Hake, S=Sole, T=Tuna
 FISH_PER_OPERATOR = 4          # How many fish each operator has to sell
 
+# Fish type -> array slot (H=0, S=1, T=2), used to index per-type NumPy state
+NUM_TYPES = len(FISH_TYPES)
+TYPE_IDX = {t: i for i, t in enumerate(FISH_TYPES)}
+# Fish types travel as integer codes in messages and agent state; the letters
+# are only needed for console logs (FISH_TYPES[code]) and the CSV log:
+FISH_TYPE_BYTES = [t.encode() for t in FISH_TYPES]  # Code -> CSV bytes (b'H', b'S', b'T')
+
+# Types owned by a merchant are tracked as a bitmask: bit TYPE_IDX[t] is set
+# once a fish of type t has been won (H=0b001, S=0b010, T=0b100)
+ALL_TYPES_MASK = (1 << NUM_TYPES) - 1  # Every type owned (diversity goal met)
+# Lookup table: owned_mask -> number of types still missing (one entry per mask)
+TYPES_MISSING = np.array([NUM_TYPES - bin(mask).count('1') for mask in range(ALL_TYPES_MASK + 1)],
+                         dtype=np.int32)
+
+# Operator inventory layout: one NumPy record per fish (type stored as TYPE_IDX code)
+INVENTORY_DTYPE = np.dtype([
+    ('id', np.int32),           # Unique product ID across all operators
+    ('type', np.uint8),         # Fish type code (FISH_TYPES[code] gives H, S or T)
+    ('start_price', np.int32),  # Initial auction price (decreases each tick)
+    ('min_price', np.int32),    # Minimum acceptable price (discard if reached)
+])
+
 # Price Configuration (each fish gets random values within these ranges)
 START_PRICE_MIN = 40           # Minimum starting price for any fish
 START_PRICE_MAX = 60           # Maximum starting price for any fish
@@ -105,6 +159,28 @@ MIN_PRICE_MAX = 15             # Minimum acceptable price (upper bound)
 PRICE_DECREMENT = 5            # How much the price drops each tick
 TICK_INTERVAL = 0.5            # Time between price updates (seconds)
 
+# Merchant budget reservation: when bidding on a missing type, keep MIN_PRICE_MAX
+# back for each OTHER type still missing. Depends only on the types owned, so it
+# is precomputed per owned_mask (read by decide_bid)
+RESERVE_FOR_MISSING = (TYPES_MISSING - 1) * MIN_PRICE_MAX
+
+# Random Configuration
+# Every agent draws from its own np.random.Generator, seeded from one root
+# SeedSequence so that a fixed seed reproduces the whole auction setup
+RANDOM_SEED = None             # Root seed (None = fresh OS entropy every run)
+
+# CPU Affinity Configuration
+# Pin every agent process to one core: one core per operator, merchants share
+# the remaining cores. This is for reproducible tick-to-bid latency (no core
+# migrations during message bursts), not throughput. Off by default: pinning
+# only pays off on an otherwise idle machine with enough cores
+PIN_AGENTS_TO_CORES = False    # Opt-in: True pins agents, False lets the OS place them
+
+# Agent Startup Configuration
+# run_agent() mostly waits on the new process and the nameserver, so agents are
+# started (and configured) from a thread pool instead of one after another
+STARTUP_WORKERS = 16           # Max agents being started at the same time
+
 # ============================================================================
 # OUTPUT CONFIGURATION
 # ============================================================================
@@ -118,6 +194,56 @@ DATE_STR = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 SETUP_CSV = os.path.join(RESULTS_DIR, f"setup_{DATE_STR}.csv")  # Merchant configurations
 LOG_CSV = os.path.join(RESULTS_DIR, f"log_{DATE_STR}.csv")      # Auction transactions
 
+# Operators buffer transaction rows in memory and write them in batches
+LOG_BATCH_SIZE = 32            # Rows buffered before a write to the log CSV
+# Fixed log row layout (Operator, Product, Type, Sale Price, Merchant), formatted
+# straight to bytes instead of going through csv.writer (no field needs quoting).
+# Rows end in \r\n like the csv.writer header written by main()
+LOG_ROW = b"%d,%d,%b,%d,%b\r\n"
+LOG_DISCARD_ROW = b"%d,%d,%b,0,\r\n"   # Discarded item: price 0, no merchant
+
+# Per-message console logging (broadcasts, bids, sales, wins/losses). When False
+# those log lines are skipped before their f-strings are built; auction start,
+# end and errors are always logged. Can be changed per agent with set_verbose()
+VERBOSE_LOGGING = True
+
+# ============================================================================
+# CPU AFFINITY
+# ============================================================================
+def assign_cores(num_operators, num_merchants):
+    """
+    Choose the core each agent process is pinned to (see PIN_AGENTS_TO_CORES).
+    
+    Operators get one core each; merchants share the cores left over (or all
+    cores, if there are no more cores than operators). Only cores this process
+    is allowed to run on are used.
+    
+    Args:
+        num_operators: Number of operator agents
+        num_merchants: Number of merchant agents
+    
+    Returns:
+        (operator_cores, merchant_cores) lists, or lists of None if pinning is
+        disabled or not supported on this platform
+    """
+    if not PIN_AGENTS_TO_CORES or not hasattr(os, 'sched_setaffinity'):
+        return [None] * num_operators, [None] * num_merchants
+    cores = sorted(os.sched_getaffinity(0))
+    operator_cores = [cores[i % len(cores)] for i in range(num_operators)]
+    spare = cores[num_operators:] or cores
+    merchant_cores = [spare[i % len(spare)] for i in range(num_merchants)]
+    return operator_cores, merchant_cores
+
+def pin_to_core(core):
+    """
+    Pin the calling process to a single CPU core (no-op if core is None).
+    
+    Args:
+        core: Core number chosen by assign_cores()
+    """
+    if core is not None:
+        os.sched_setaffinity(0, {core})
+
 # ============================================================================
 # OPERATOR CLASS (SELLER AGENT)
 # ============================================================================
@@ -144,22 +270,47 @@ class Operator(Agent):
         Initialize the Operator agent when it's created.
         Sets up communication channels and initial state.
         """
+        # Pin this agent process to its core ('core' attribute passed by main())
+        pin_to_core(getattr(self, 'core', None))
+        
         # ---- COMMUNICATION SETUP ----
-        # PUB socket: One-way broadcast to all merchants (market updates & confirmations)
-        self.bind('PUB', alias='market')
+        # PUB socket: One-way broadcast to all merchants (sale confirmations)
+        self.bind('PUB', alias='market', serializer=WIRE_SERIALIZER)
+        
+        # PUB socket: One-way broadcast of AUCTION_ITEM price updates
+        # Kept separate from 'market' because merchants subscribe to it with
+        # ZMQ_CONFLATE (only the latest price is kept), and conflation must
+        # never drop a SALE_CONFIRMATION
+        self.bind('PUB', alias='prices', serializer=WIRE_SERIALIZER)
         
         # PULL socket: Receives buy requests from merchants asynchronously
         # When a message arrives, it automatically calls handle_buy()
-        self.bind('PULL', alias='sales', handler='handle_buy')
+        self.bind('PULL', alias='sales', handler='handle_buy', serializer=WIRE_SERIALIZER)
         
         # ---- STATE VARIABLES ----
-        self.inventory = []              # List of fish to sell (populated later)
+        self.inventory = np.empty(0, dtype=INVENTORY_DTYPE)  # Fish to sell (populated later)
         self.current_item_idx = 0        # Which item we're currently auctioning
-        self.current_price = 0           # Current price of active item (set when item starts)
+        self.price_step = 0              # Index into the current item's price schedule (next price to broadcast)
+        self._schedules = []             # Per-item broadcast prices (see init_inventory)
         self.auction_active = False      # Is the auction running?
         self.is_sold = False             # Has current item been sold?
         self.log_filename = "log.csv"    # Where to log transactions
         self.operator_id = 1             # Unique ID for this operator
+        self._next_tick = None           # Monotonic deadline of next tick (None = not ticking)
+        self._verbose = VERBOSE_LOGGING  # Log per-tick/per-sale lines (see VERBOSE_LOGGING)
+        self._broadcasts = []            # Pre-encoded AUCTION_ITEM frames, aligned with _schedules
+        
+        # NumPy generator created inside the agent process: the global NumPy
+        # random state is copied when agent processes fork, so all operators
+        # would otherwise draw identical inventories. 'seed' (a child of the
+        # RANDOM_SEED SeedSequence) is passed in as an attribute by main()
+        self._rng = np.random.default_rng(getattr(self, 'seed', None))
+        
+        # ---- TRANSACTION LOG BUFFER ----
+        # Rows are buffered and written in batches through one persistent handle
+        # (opened on first flush) instead of open+write+flush per transaction
+        self._log_fh = None              # Persistent log file handle (binary)
+        self._log_buf = []               # Encoded rows (LOG_ROW) not yet written to disk
 
     def set_log_file(self, filename):
         """Set the CSV file where transactions will be logged"""
@@ -169,6 +320,32 @@ class Operator(Agent):
         """Set the unique identifier for this operator"""
         self.operator_id = op_id
     
+    def set_verbose(self, verbose):
+        """Turn per-tick/per-sale log lines on or off (overrides VERBOSE_LOGGING)"""
+        self._verbose = verbose
+    
+    def set_done_channel(self, endpoint):
+        """
+        Connect to the main process's completion channel.
+        When the auction finishes, the operator pushes its operator_id there
+        (see tick), so main() doesn't have to poll every operator.
+        
+        Args:
+            endpoint: Address of the main process's PULL socket ('host:port', TCP)
+        """
+        self.connect(AgentAddress('tcp', endpoint, 'PULL', 'server', WIRE_SERIALIZER), alias='done')
+    
+    def get_connection_info(self):
+        """
+        Return everything a merchant needs to connect to this operator, in a
+        single call (one proxy round-trip instead of one per field).
+        
+        Returns:
+            Tuple (operator_id, market_addr, prices_addr, sales_addr), as
+            expected by Merchant.setup_connections()
+        """
+        return (self.operator_id, self.addr('market'), self.addr('prices'), self.addr('sales'))
+    
     def init_inventory(self, num_fish, start_product_id):
         """
         Initialize the operator's inventory with fish to sell.
@@ -185,47 +362,124 @@ class Operator(Agent):
             num_fish: How many fish this operator will sell
             start_product_id: Starting ID to ensure unique IDs across all operators
         """
-        self.inventory = []
-        for i in range(num_fish):
-            # Generate random prices for this specific fish (independent of other fish)
-            start_price = random.randint(START_PRICE_MIN, START_PRICE_MAX)
-            min_price = random.randint(MIN_PRICE_MIN, MIN_PRICE_MAX)
-            
-            # Ensure starting price is higher than minimum (allow at least 2 price drops)
-            if start_price <= min_price:
-                start_price = min_price + 2 * PRICE_DECREMENT
-            
-            self.inventory.append({
-                'id': start_product_id + i,        # Unique product ID across all operators
-                'type': random.choice(FISH_TYPES), # Random type: H (Hake), S (Sole), or T (Tuna)
-                'start_price': start_price,        # Initial auction price (decreases each tick)
-                'min_price': min_price             # Minimum acceptable price (discard if reached)
-            })
+        # Generate random prices and types for all fish at once (one call per field,
+        # each fish still gets INDEPENDENT values)
+        start_prices = self._rng.integers(START_PRICE_MIN, START_PRICE_MAX + 1, num_fish)
+        min_prices = self._rng.integers(MIN_PRICE_MIN, MIN_PRICE_MAX + 1, num_fish)
+        types = self._rng.integers(0, NUM_TYPES, num_fish)
+        
+        # Ensure starting price is higher than minimum (allow at least 2 price drops)
+        start_prices = np.where(start_prices <= min_prices, min_prices + 2 * PRICE_DECREMENT, start_prices)
+        
+        # Pack everything into a single record array (see INVENTORY_DTYPE)
+        inventory = np.empty(num_fish, dtype=INVENTORY_DTYPE)
+        inventory['id'] = np.arange(start_product_id, start_product_id + num_fish)
+        inventory['type'] = types
+        inventory['start_price'] = start_prices
+        inventory['min_price'] = min_prices
+        self.inventory = inventory
+        
+        # Precompute each item's price schedule: every price it will be broadcast at
+        # (start_price, start_price - PRICE_DECREMENT, ... down to min_price), so an
+        # item is discarded once its schedule is exhausted
+        self._schedules = [np.arange(start, low - 1, -PRICE_DECREMENT, dtype=np.int32)
+                           for start, low in zip(start_prices, min_prices)]
 
     def start_auction(self):
         """
         Start the auction process.
-        Sets a recurring timer that calls tick() every TICK_INTERVAL seconds.
-        Initializes the price from the first item's starting price.
+        Arms the tick deadline so tick() runs every TICK_INTERVAL seconds
+        (first tick immediately), driven from the agent's poll loop.
+        The first item starts at the beginning of its price schedule.
         """
         self.auction_active = True
+        self.price_step = 0
         
-        # Set initial price from first item (if inventory exists)
-        if len(self.inventory) > 0:
-            self.current_price = self.inventory[0]['start_price']
-        
-        self.each(TICK_INTERVAL, 'tick')  # Schedule tick() to run repeatedly
+        self.build_broadcasts()
+        self._next_tick = time.monotonic()  # Schedule tick() to run repeatedly
         self.log_info("Auction started!")
 
+    def build_broadcasts(self):
+        """
+        Pre-encode every AUCTION_ITEM broadcast this operator can send.
+        
+        An item's broadcast only changes in its price, which follows the item's
+        precomputed schedule. So all frames are known before the auction starts:
+        _broadcasts[i][step] holds the ready-to-send (msgpack) frame for item i
+        at price _schedules[i][step].
+        """
+        self._broadcasts = []
+        for item, schedule in zip(self.inventory, self._schedules):
+            p_id = int(item['id'])
+            p_type = int(item['type'])  # Type code (TYPE_IDX slot)
+            frames = []
+            for price in schedule.tolist():
+                msg = {
+                    't': MSG_AUCTION_ITEM,
+                    'o': self.operator_id,
+                    'p': p_id,
+                    'k': p_type,
+                    'x': price
+                }
+                frames.append(msgpack.packb(msg))
+            self._broadcasts.append(frames)
+
+    # ---- TICK SCHEDULING ----
+    # Ticks are driven by the agent's own poll loop instead of an osBrain timer
+    # (each() runs a timer thread per operator that calls back into the agent
+    # through a loopback socket on every tick).
+    #
+    # osBrain polls the agent's sockets for `_poll_timeout` milliseconds and calls
+    # idle() when nothing arrived, or _process_events() when messages did. The
+    # timeout is computed from the monotonic deadline of the next tick, so the
+    # poll wakes up exactly when a tick is due, and the deadline is checked on
+    # both paths, so a steady stream of messages cannot postpone a tick.
+    @property
+    def _poll_timeout(self):
+        next_tick = getattr(self, '_next_tick', None)
+        if next_tick is None:
+            return self._idle_poll_timeout
+        # Round up to the next millisecond so we never wake up just before the deadline
+        return max(0, int((next_tick - time.monotonic()) * 1000) + 1)
+
+    @_poll_timeout.setter
+    def _poll_timeout(self, value):
+        # Poll timeout used while no auction is running (set by osBrain)
+        self._idle_poll_timeout = value
+
+    def idle(self):
+        """Called by osBrain when the poll timeout expires with no incoming messages."""
+        self._tick_if_due()
+
+    def _process_events(self, events):
+        """Handle incoming messages (osBrain), then run a tick that became due meanwhile."""
+        super()._process_events(events)
+        self._tick_if_due()
+
+    def _tick_if_due(self):
+        """
+        Run tick() if its deadline has passed. If we fell behind by more than one
+        interval, missed ticks are skipped instead of being run back to back.
+        """
+        if self._next_tick is None:
+            return
+        now = time.monotonic()
+        if now < self._next_tick:
+            return
+        missed = int((now - self._next_tick) // TICK_INTERVAL)
+        self._next_tick += (missed + 1) * TICK_INTERVAL
+        self.tick()
+
     def tick(self):
         """
         Called every TICK_INTERVAL seconds during the auction.
         This implements the core Dutch auction mechanism.
         
         DUTCH AUCTION FLOW (per tick):
-        1. Check if current price is already below minimum (discard if so)
+        1. Check if the item's price schedule is exhausted, i.e. the next price
+           would be below minimum (discard if so)
         2. Broadcast current item and price to all merchants
-        3. Decrease price by PRICE_DECREMENT for next tick
+        3. Advance to the next (PRICE_DECREMENT lower) price of the schedule
         4. Wait for merchants to respond (they have full TICK_INTERVAL)
         
         IMPORTANT:
@@ -239,56 +493,66 @@ class Operator(Agent):
         if not self.auction_active:
             return
         
+        # Hot path: read state once into locals (LOAD_FAST instead of repeated
+        # attribute/global lookups)
+        inventory = self.inventory
+        idx = self.current_item_idx
+        step = self.price_step
+        
         # Check if we've sold all items
-        if self.current_item_idx >= len(self.inventory):
+        if idx >= len(inventory):
+            self.flush_log()  # Write remaining rows before reporting completion
+            self._next_tick = None  # Stop ticking
             self.auction_active = False
             self.log_info("Auction finished. No more items.")
+            if 'done' in self._socket:
+                self.send('done', msgpack.packb(self.operator_id))  # Notify main()
             return
 
         # Get the current item being auctioned
-        item = self.inventory[self.current_item_idx]
+        # (record fields are NumPy scalars; convert to plain int/str for messages)
+        item = inventory[idx]
+        p_id = int(item['id'])
+        p_type = int(item['type'])  # Type code (TYPE_IDX slot)
         
         # ---- CHECK IF PRICE ALREADY TOO LOW ----
-        # If current price is below minimum, discard without broadcasting
+        # If the schedule is exhausted the next price is below minimum: discard
+        # without broadcasting
         # This prevents broadcasting items that are already below minimum
-        if self.current_price < item['min_price']:
-            self.log_info(f"Item {item['id']} ({item['type']}) discarded (price {self.current_price} below minimum {item['min_price']}).")
+        schedule = self._schedules[idx]
+        if step >= len(schedule):
+            if self._verbose:
+                price = int(item['start_price']) - step * PRICE_DECREMENT
+                self.log_info(f"Item {p_id} ({FISH_TYPES[p_type]}) discarded (price {price} below minimum {item['min_price']}).")
             # Log with price=0 and no merchant to indicate discard
-            self.log_sale(item['id'], item['type'], 0, "") 
+            self.log_discard(p_id, p_type)
             self.next_item()  # Move to next item
             return  # Exit this tick, next tick will handle next item
         
         # ---- BROADCAST AUCTION STATE ----
-        # Send product info to all merchants via PUB socket
+        # Send product info to all merchants via the 'prices' PUB socket
         # Merchants have the full TICK_INTERVAL to respond
-        msg = {
-            'type': 'AUCTION_ITEM',
-            'operator_id': self.operator_id,
-            'product_id': item['id'],
-            'product_type': item['type'],
-            'price': self.current_price
-        }
-        self.send('market', msg)
-        self.log_info(f"Broadcasting: Item {item['id']} ({item['type']}) at {self.current_price}")
+        # (frame was pre-encoded by build_broadcasts, so it goes straight to the socket)
+        self._socket['prices'].send(self._broadcasts[idx][step])
+        if self._verbose:
+            self.log_info(f"Broadcasting: Item {p_id} ({FISH_TYPES[p_type]}) at {schedule[step]}")
         
         # ---- DUTCH AUCTION: DECREASE PRICE ----
-        # Decrease price for next tick
+        # Advance to the next (lower) price in the schedule for next tick
         # Merchants can still buy at the broadcasted price during this tick
-        self.current_price -= PRICE_DECREMENT
+        self.price_step = step + 1
 
     def next_item(self):
         """
         Move to the next item in inventory.
-        Resets price to the new item's starting price and clears sold flag.
+        Restarts at the beginning of the new item's price schedule (its
+        individual starting price) and clears sold flag.
         """
         self.current_item_idx += 1
         self.is_sold = False
+        self.price_step = 0
         
-        # Set price to the new item's individual starting price
-        if self.current_item_idx < len(self.inventory):
-            self.current_price = self.inventory[self.current_item_idx]['start_price']
-        
-    def handle_buy(self, msg):
+    def handle_buy(self, data):
         """
         Process buy requests from merchants.
         This is called automatically when a merchant sends a BUY message to the PULL socket.
@@ -307,56 +571,58 @@ class Operator(Agent):
         6. All merchants notified via SALE_CONFIRMATION broadcast
         
         Args:
-            msg: Dictionary with product_id, merchant_id, operator_id
+            data: BUY_REQUEST bytes (operator_id, product_id, merchant_id)
         """
         # Ignore requests if auction is not active
         if not self.auction_active:
             return 
+        _, req_pid, m_id = struct.unpack(BUY_REQUEST, data)  # Which product, and who wants it
         
         # ---- BOUNDS CHECK ----
         # Prevent crash from late-arriving buy requests after auction finishes
         # This can happen when a merchant sends a BUY just as the last item sells
-        if self.current_item_idx >= len(self.inventory):
+        inventory = self.inventory   # Hot path locals (see tick)
+        idx = self.current_item_idx
+        if idx >= len(inventory):
             return  # Auction finished, ignore late requests
         
         # Extract information from the buy request
-        current_item = self.inventory[self.current_item_idx]
-        req_pid = msg.get('product_id')      # Which product they want to buy
-        m_id = msg.get('merchant_id', 'Unknown')  # Who wants to buy it
+        current_item = inventory[idx]
+        current_pid = int(current_item['id'])
         
         # ---- VALIDATE AND PROCESS PURCHASE ----
         # Check: Is this the current item? Has it not been sold yet?
         # CRITICAL: This check prevents double-selling when multiple bids arrive!
-        if req_pid == current_item['id'] and not self.is_sold:
+        if req_pid == current_pid and not self.is_sold:
             # SALE ACCEPTED!
             # 
             # PRICE CALCULATION:
-            # self.current_price was already decremented in tick() for the NEXT tick,
-            # but the merchant is buying at the price we BROADCASTED (before decrement).
-            # Therefore: sale_price = current_price + PRICE_DECREMENT
-            sale_price = self.current_price + PRICE_DECREMENT
+            # self.price_step was already advanced in tick() for the NEXT tick,
+            # but the merchant is buying at the price we BROADCASTED (previous step).
+            sale_price = int(self._schedules[idx][self.price_step - 1])
             
             # ⚠️ ATOMIC FLAG: Set immediately to prevent double-selling!
             # Next bid for this item will see is_sold=True and be rejected
             self.is_sold = True
             
-            self.log_info(f"SOLD item {current_item['id']} to {m_id} for {sale_price}")
+            p_type = int(current_item['type'])  # Type code (TYPE_IDX slot)
+            if self._verbose:
+                self.log_info(f"SOLD item {current_pid} to {m_id} for {sale_price}")
             
             # Log the transaction to CSV
-            self.log_sale(current_item['id'], current_item['type'], sale_price, m_id)
+            self.log_sale(current_pid, p_type, sale_price, m_id)
             
             # ---- BROADCAST SALE CONFIRMATION ----
             # Tell all merchants about the sale (winner knows they won, losers know they lost)
             confirmation = {
-                'type': 'SALE_CONFIRMATION',
-                'operator_id': self.operator_id,
-                'product_id': current_item['id'],
-                'product_type': current_item['type'],  # Include type so merchants can track what they won
-                'merchant_id': m_id,
-                'price': sale_price,
-                'msg': 'SOLD'
+                't': MSG_SALE_CONFIRMATION,
+                'o': self.operator_id,
+                'p': current_pid,
+                'k': p_type,  # Include type code so merchants can track what they won
+                'm': m_id,
+                'x': sale_price
             }
-            self.send('market', confirmation)
+            self.send('market', msgpack.packb(confirmation))
             
             # Move to next item in inventory
             self.next_item()
@@ -370,27 +636,167 @@ class Operator(Agent):
 
     def log_sale(self, product_id, product_type, price, merchant_id):
         """
-        Write a sale transaction to the CSV log file.
+        Record a sale transaction for the CSV log file.
         
         Format: Operator, Product, Type, Sale Price, Merchant
-        If price=0 and merchant_id="", it means the item was discarded.
+        Discarded items are recorded by log_discard() (price 0, no merchant).
+        
+        Rows are buffered in memory and written every LOG_BATCH_SIZE rows
+        (and when the auction finishes), keeping disk I/O off the hot path.
         
         Args:
             product_id: Unique ID of the fish
-            product_type: Type of fish (H, S, or T)
-            price: Final sale price (or 0 if discarded)
-            merchant_id: ID of buyer (or "" if discarded)
+            product_type: Fish type code (TYPE_IDX slot)
+            price: Final sale price
+            merchant_id: ID of buyer
         """
-        fname = getattr(self, 'log_filename', 'log.csv') 
+        # Buffer: Operator ID, Product ID, Type, Price, Merchant ID (as one LOG_ROW)
+        self._log_buf.append(LOG_ROW % (self.operator_id, product_id, FISH_TYPE_BYTES[product_type],
+                                        price, str(merchant_id).encode()))
+        if len(self._log_buf) >= LOG_BATCH_SIZE:
+            self.flush_log()
+
+    def log_discard(self, product_id, product_type):
+        """
+        Record a discarded item (price fell below its minimum) for the CSV log.
+        
+        Same row layout as log_sale with price 0 and an empty Merchant column,
+        buffered in order with the sales so the log stays chronological.
+        
+        Args:
+            product_id: Unique ID of the fish
+            product_type: Fish type code (TYPE_IDX slot)
+        """
+        self._log_buf.append(LOG_DISCARD_ROW % (self.operator_id, product_id, FISH_TYPE_BYTES[product_type]))
+        if len(self._log_buf) >= LOG_BATCH_SIZE:
+            self.flush_log()
+
+    def flush_log(self):
+        """
+        Write all buffered transaction rows to the CSV log file.
+        The file is opened once (binary append mode, 64 KiB buffer) and kept open;
+        the header row is written by main() when it creates the file.
+        """
+        if not self._log_buf:
+            return
         try:
-            with open(fname, 'a', newline='') as f:
-                writer = csv.writer(f)
-                # Write: [Operator ID, Product ID, Type, Price, Merchant ID]
-                writer.writerow([self.operator_id, product_id, product_type, price, merchant_id])
-                f.flush()  # Force write to disk immediately
+            if self._log_fh is None:
+                self._log_fh = open(self.log_filename, 'ab', buffering=1 << 16)
+            self._log_fh.write(b''.join(self._log_buf))
+            self._log_fh.flush()  # One write per batch (other operators append to the same file)
+            self._log_buf.clear()
         except Exception as e:
             self.log_info(f"Error writing log: {e}")
 
+    def shutdown(self):
+        """
+        Flush and close the transaction log before the agent shuts down
+        (called by osBrain when the nameserver shuts down all agents).
+        """
+        self.flush_log()
+        if self._log_fh is not None:
+            self._log_fh.close()
+            self._log_fh = None
+        super().shutdown()
+
+# ============================================================================
+# MERCHANT DECISION KERNEL
+# ============================================================================
+# The three-priority bidding strategy is pure arithmetic on integers and the
+# types-owned bitmask, so it is compiled to machine code with Numba. osBrain
+# message plumbing stays in Python; only this kernel runs on every broadcast.
+#
+# The kernel returns a reason code instead of a string (strings are built
+# only when a bid is actually sent, for logging).
+BID_NONE = 0               # Don't bid
+BID_DIVERSITY = 1          # Missing type, enough budget left for other missing types
+BID_DIVERSITY_URGENT = 2   # Missing type, price within 40% of available budget
+BID_PREFERENCE = 3         # Preferred type, price within 60% of available budget
+BID_BARGAIN = 4            # Any type at a very low price (≤ 15)
+
+@njit(cache=True)
+def decide_bid(price, type_idx, pref_idx, owned_mask, available_budget):
+    """
+    Decide whether to bid on an item (goal-oriented strategy).
+    
+    Args:
+        price: Current asking price
+        type_idx: Fish type of the item (TYPE_IDX slot)
+        pref_idx: Merchant's preferred fish type (TYPE_IDX slot)
+        owned_mask: Types owned so far (bit TYPE_IDX[t] set = own type t)
+        available_budget: Budget minus the sum of pending bids
+    
+    Returns:
+        One of the BID_* reason codes (BID_NONE means don't bid)
+    """
+    # ---- BASIC BUDGET CHECK ----
+    if price > available_budget:
+        return BID_NONE  # Can't afford this item (considering pending bids)
+    
+    # Calculate how many types we still need to complete diversity goal
+    types_needed = TYPES_MISSING[owned_mask]
+    
+    # ========================================
+    # PRIORITY 1: DIVERSITY - Get at least one of each type
+    # ========================================
+    if not (owned_mask >> type_idx) & 1:
+        # We need this type to achieve diversity goal!
+        
+        # BUDGET RESERVATION STRATEGY:
+        # Reserve enough budget for remaining missing types to ensure we can
+        # still afford them later. Estimate MIN_PRICE_MAX per missing type
+        # (precomputed per owned_mask, see RESERVE_FOR_MISSING).
+        budget_to_reserve = RESERVE_FOR_MISSING[owned_mask]
+        affordable_price = available_budget - budget_to_reserve
+        
+        if price <= affordable_price:
+            # Safe to buy: Have enough left for other missing types
+            return BID_DIVERSITY
+        if types_needed > 0 and price <= available_budget * 0.4:
+            # Price is higher than safe amount, but still reasonable
+            # Buy anyway if not too expensive (max 40% of available budget per fish)
+            return BID_DIVERSITY_URGENT
+    
+    # ========================================
+    # PRIORITY 2: PREFERENCE SATISFACTION - Get more of preferred type
+    # ========================================
+    elif type_idx == pref_idx:
+        # We already have this type (diversity goal met for this type)
+        # Don't spend too much on non-critical purchases (max 60% of available budget)
+        # Keep some budget for diversity if we haven't completed that goal yet
+        if price <= available_budget * 0.6:
+            return BID_PREFERENCE
+    
+    # ========================================
+    # PRIORITY 3: OPPORTUNISTIC - Take bargains
+    # ========================================
+    elif price <= 15:
+        # Price is very low - good deal on any fish type
+        return BID_BARGAIN
+    
+    return BID_NONE
+
+def make_bid_decider(pref_idx):
+    """
+    Build a decide_bid specialized for one merchant's preferred type.
+    
+    A merchant's preference never changes, so it is captured as a compile-time
+    constant of a small Numba wrapper: decide_bid (cached on disk) is inlined
+    into it and the preference comparison is folded away. Only the wrapper is
+    compiled per merchant, at Merchant start-up.
+    
+    Args:
+        pref_idx: Merchant's preferred fish type (TYPE_IDX slot)
+    
+    Returns:
+        Compiled function decide(price, type_idx, owned_mask, available_budget)
+        returning a BID_* reason code
+    """
+    @njit
+    def decide(price, type_idx, owned_mask, available_budget):
+        return decide_bid(price, type_idx, pref_idx, owned_mask, available_budget)
+    return decide
+
 # ============================================================================
 # MERCHANT CLASS (BUYER AGENT)
 # ============================================================================
@@ -450,27 +856,71 @@ class Merchant(Agent):
         2. Obtain as many preferred fish as possible (preference satisfaction)
         3. Stay within budget (no negative balance)
         """
+        # Pin this agent process to its core (see Operator.on_init)
+        pin_to_core(getattr(self, 'core', None))
+        
         # ---- MERCHANT ATTRIBUTES ----
+        self._rng = np.random.default_rng(getattr(self, 'seed', None))  # Per-agent generator (see Operator)
         self.budget = 100  # Starting money
-        self.preference = random.choice(FISH_TYPES)  # Random favorite fish type
-        self.inventory = []  # Fish purchased during auction
+        self.pref_idx = int(self._rng.integers(NUM_TYPES))  # Random favorite fish type (type code)
+        self.preference = FISH_TYPES[self.pref_idx]         # Preference letter (for setup CSV / logs)
+        self._decide = make_bid_decider(self.pref_idx)  # decide_bid specialized for our preference
+        self.inventory = []  # Fish purchased during auction, as (product_id, price, type code) tuples
         
         # Extract merchant ID from agent name (e.g., "Merchant_1" -> 1)
-        self.merchant_id = int(self.name.split('_')[-1]) if '_' in self.name else random.randint(100, 999)
+        self.merchant_id = int(self.name.split('_')[-1]) if '_' in self.name else int(self._rng.integers(100, 1000))
         
         # ---- GOAL TRACKING ----
-        # Track which types we have acquired (for "at least one of each" goal)
-        self.types_owned = set()  # Set of fish types we've acquired
+        # Bitmask of types owned, bit TYPE_IDX[t] per type (H=0, S=1, T=2).
+        # Diversity goal ("at least one of each") is met when it equals ALL_TYPES_MASK
+        self.owned_mask = 0
         
         # ---- STATE TRACKING ----
-        # pending_buy_pids is CRITICAL for race condition handling!
-        # - Maps operator_id -> product_id for each pending bid
+        # Pending bids are CRITICAL for race condition handling!
+        # Stored as fixed-size arrays with one slot per operator (slot = operator_id - 1):
+        # - pending_pids[slot]: product_id of our pending bid (0 = no pending bid)
+        # - pending_amounts[slot]: amount reserved for that bid (for budget tracking)
         # - Allows bidding on multiple items from different operators simultaneously
         # - Prevents sending multiple bids for same item from same operator
         # - Cleared when we receive SALE_CONFIRMATION (win or lose)
-        self.pending_buy_pids = {}  # Maps operator_id -> product_id (prevents duplicate bids per operator)
-        self.pending_buy_amounts = {}  # Maps operator_id -> bid amount (for budget tracking)
+        self.pending_pids = np.zeros(NUM_OPERATORS, dtype=np.int32)
+        self.pending_amounts = np.zeros(NUM_OPERATORS, dtype=np.int32)
+        self.pending_total = 0          # Running sum of pending_amounts (kept in step by _clear_pending)
         self.operator_connections = {}  # Maps operator_id -> sales channel alias
+        self._price_sockets = set()     # Conflated 'prices' SUB sockets (see _process_events)
+        self._verbose = VERBOSE_LOGGING # Log per-bid/per-sale lines (see VERBOSE_LOGGING)
+        
+        # Message tag -> bound handler (used by handle_market)
+        self._msg_dispatch = {
+            MSG_AUCTION_ITEM: self.handle_auction_item,        # New item or price update
+            MSG_SALE_CONFIRMATION: self.handle_confirmation,  # Item sold - did we win or lose?
+        }
+        
+        # ---- WARM UP DECISION KERNEL ----
+        # Trigger Numba compilation (kernel loaded from cache, wrapper compiled) now,
+        # so the first real AUCTION_ITEM message doesn't pay the compile latency
+        self._decide(0, 0, self.owned_mask, 0)
+        
+        # ---- CONNECT TO OPERATORS ----
+        # Operator addresses can be passed in at creation ('operators' attribute,
+        # as for setup_connections), so connecting costs no extra proxy call
+        operators = getattr(self, 'operators', None)
+        if operators:
+            self.setup_connections(operators)
+        
+    def set_verbose(self, verbose):
+        """Turn per-bid/per-sale log lines on or off (overrides VERBOSE_LOGGING)"""
+        self._verbose = verbose
+        
+    def get_setup(self):
+        """
+        Return this merchant's initial configuration for the setup CSV, in a
+        single call (one proxy round-trip instead of one per field).
+        
+        Returns:
+            Tuple (preference, budget)
+        """
+        return (self.preference, self.budget)
         
     def setup_connections(self, operators):
         """
@@ -478,16 +928,33 @@ class Merchant(Agent):
         Each merchant can buy from any operator.
         
         Args:
-            operators: List of tuples [(op_id, market_addr, sales_addr), ...]
+            operators: List of tuples [(op_id, market_addr, prices_addr, sales_addr), ...]
                       - op_id: Operator's unique ID
-                      - market_addr: Address for receiving broadcasts (SUB)
+                      - market_addr: Address for receiving sale confirmations (SUB)
+                      - prices_addr: Address for receiving item price broadcasts (SUB)
                       - sales_addr: Address for sending buy requests (PUSH)
         """
-        for op_id, market_addr, sales_addr in operators:
+        for op_id, market_addr, prices_addr, sales_addr in operators:
             # ---- SUBSCRIBE TO MARKET BROADCASTS ----
-            # SUB socket: Receive auction updates and sale confirmations
+            # SUB socket: Receive sale confirmations
             # All messages go to handle_market() method
-            self.connect(market_addr, handler='handle_market')
+            # A single SUB socket fans in every operator's 'market' PUB (ZMQ SUB
+            # sockets can connect to many publishers), so a merchant holds one
+            # confirmation socket instead of one per operator
+            if 'market' not in self._socket:
+                self.connect(market_addr, alias='market', handler='handle_market')
+            else:
+                self._socket['market'].connect(f'{market_addr.transport}://{market_addr.address}')
+            
+            # ---- SUBSCRIBE TO PRICE BROADCASTS (CONFLATED) ----
+            # SUB socket: Receive AUCTION_ITEM price updates, also routed to handle_market()
+            # Only the latest price of an operator is actionable, so stale broadcasts
+            # that queue up while we are busy are dropped inside ZMQ (ZMQ_CONFLATE)
+            # instead of being decoded and evaluated in Python.
+            prices_alias = f'prices_{op_id}'
+            self.connect(prices_addr, alias=prices_alias, handler='handle_market')
+            self._conflate(prices_alias, prices_addr)
+            self._price_sockets.add(self._socket[prices_alias])
             
             # ---- SETUP PURCHASE CHANNEL ----
             # PUSH socket: Send buy requests to this specific operator
@@ -496,22 +963,78 @@ class Merchant(Agent):
             self.connect(sales_addr, alias=sales_alias)
             self.operator_connections[op_id] = sales_alias
         
-    def handle_market(self, msg):
+    def _conflate(self, alias, server_addr):
         """
-        Router for all messages received from operators.
-        This is called whenever ANY operator broadcasts a message.
+        Enable ZMQ_CONFLATE (keep only the last message) on a connected SUB socket.
+        
+        osBrain creates and connects the socket in one step, and ZMQ only applies
+        CONFLATE to connections made after the option is set, so the endpoint is
+        reconnected once (subscriptions are kept by the socket).
+        
+        Args:
+            alias: Alias of the SUB socket (as passed to connect)
+            server_addr: Operator address the socket is connected to
+        """
+        socket = self._socket[alias]
+        endpoint = f'{server_addr.transport}://{server_addr.address}'
+        socket.disconnect(endpoint)
+        socket.setsockopt(zmq.CONFLATE, 1)
+        socket.connect(endpoint)
+        
+    def _process_events(self, events):
+        """
+        Process the events of one poll of the agent's sockets (osBrain hook).
+        
+        All sockets that became readable in the same poll are handled together:
+        confirmations and other messages first (so budget and pending bids are
+        up to date), then every AUCTION_ITEM broadcast that arrived at the same
+        time is evaluated as one batch by handle_auction_batch().
         
         Args:
-            msg: Dictionary with 'type' field indicating message type
+            events: Dictionary {socket: event} returned by the poller
+        """
+        broadcasts = []
+        for socket in events:
+            if events[socket] != zmq.POLLIN:
+                continue
+            if socket in self._price_sockets:
+                broadcasts.append(msgpack.unpackb(socket.recv()))  # Raw msgpack frame (see WIRE_SERIALIZER)
+            else:
+                self._process_single_event(socket)
+        if broadcasts:
+            self.handle_auction_batch(broadcasts)
+        
+    def handle_auction_batch(self, broadcasts):
         """
-        msg_type = msg.get('type')
+        Evaluate AUCTION_ITEM broadcasts from several operators received together.
         
-        if msg_type == 'SALE_CONFIRMATION':
-            # An item was sold - check if we won or lost
-            self.handle_confirmation(msg)
-        elif msg_type == 'AUCTION_ITEM':
-            # New item being auctioned or price update
+        Cheapest items are considered first, so when the budget only allows some
+        of the bids the merchant spends it on the best deals of the batch rather
+        than on whichever broadcast happened to be read first.
+        
+        Args:
+            broadcasts: List of AUCTION_ITEM messages (at most one per operator)
+        """
+        if len(broadcasts) > 1:
+            broadcasts.sort(key=lambda msg: msg['x'])
+        for msg in broadcasts:
             self.handle_auction_item(msg)
+        
+    def handle_market(self, data):
+        """
+        Router for all messages received from operators.
+        This is called whenever ANY operator broadcasts a message.
+        
+        Dispatches on the message tag through _msg_dispatch (one dict lookup);
+        unknown tags are ignored.
+        
+        Args:
+            data: msgpack-encoded dictionary with 't' field (integer tag) indicating message type
+        """
+        msg = msgpack.unpackb(data)
+        handler = self._msg_dispatch.get(msg['t'])
+        if handler is not None:
+            handler(msg)
             
     def handle_confirmation(self, msg):
         """
@@ -529,45 +1052,58 @@ class Merchant(Agent):
         3. Winner (this merchant):
            - Deducts price from budget
            - Adds item to inventory
-           - Adds type to types_owned (tracks diversity goal)
+           - Sets the type's bit in owned_mask (tracks diversity goal)
            - Clears pending bid for this operator
         4. Losers (other merchants):
            - Clear pending bid for this operator
            - Ready to bid on next item from that operator
         
         Args:
-            msg: Dictionary with operator_id, product_id, product_type, merchant_id (winner), price
+            msg: SALE_CONFIRMATION with 'o' (operator_id), 'p' (product_id), 'k' (type code), 'm' (winner merchant_id), 'x' (price)
         """
-        op_id = msg.get('operator_id')
-        product_id = msg.get('product_id')
-        product_type = msg.get('product_type')  # Get the fish type to track what we own
+        op_id = msg['o']
+        product_id = msg['p']
+        type_idx = msg['k']                     # Fish type code, to track what we own
+        slot = op_id - 1                        # Pending-bid slot for this operator
         
         # ---- CHECK IF WE WON ----
-        if msg.get('merchant_id') == self.merchant_id:
+        if msg['m'] == self.merchant_id:
             # ✅ SUCCESS! We won the auction (we were the fastest/first processed)
-            price = msg['price']
+            price = msg['x']
             
             # Update our state
             self.budget -= price  # Deduct money spent
-            self.inventory.append({'id': product_id, 'price': price, 'type': product_type})
+            self.inventory.append((product_id, price, type_idx))
             
-            # Track which types we own (for "at least one of each" goal)
-            self.types_owned.add(product_type)
+            # Mark this type as owned (for "at least one of each" goal)
+            self.owned_mask |= 1 << type_idx
             
-            self.log_info(f"WON {product_type} (item {product_id}) for {price}. Budget: {self.budget}. Types owned: {self.types_owned}")
+            if self._verbose:
+                types_owned = [t for i, t in enumerate(FISH_TYPES) if (self.owned_mask >> i) & 1]
+                self.log_info(f"WON {FISH_TYPES[type_idx]} (item {product_id}) for {price}. Budget: {self.budget}. Types owned: {types_owned}")
             
             # Clear pending bid for this operator (both product ID and amount)
-            self.pending_buy_pids.pop(op_id, None)
-            self.pending_buy_amounts.pop(op_id, None)
+            self._clear_pending(slot)
         else:
             # ❌ Someone else won the item
             # If we were trying to buy this item from this operator, we lost the race
-            if self.pending_buy_pids.get(op_id) == product_id:
-                self.log_info(f"Lost item {product_id} to Merchant {msg.get('merchant_id')}")
+            if self.pending_pids[slot] == product_id:
+                if self._verbose:
+                    self.log_info(f"Lost item {product_id} to Merchant {msg['m']}")
                 
                 # ⚠️ CRITICAL: Clear flags for this operator so we can bid on their next item!
-                self.pending_buy_pids.pop(op_id, None)
-                self.pending_buy_amounts.pop(op_id, None)
+                self._clear_pending(slot)
+
+    def _clear_pending(self, slot):
+        """
+        Forget the pending bid of one operator slot and release its reserved amount.
+        
+        Args:
+            slot: Pending-bid slot (operator_id - 1)
+        """
+        self.pending_pids[slot] = 0
+        self.pending_total -= int(self.pending_amounts[slot])
+        self.pending_amounts[slot] = 0
 
     def handle_auction_item(self, msg):
         """
@@ -587,28 +1123,27 @@ class Merchant(Agent):
         - The budget allows for it (no negative balance)
         
         Args:
-            msg: Contains operator_id, product_id, product_type, price
+            msg: AUCTION_ITEM with 'o' (operator_id), 'p' (product_id), 'k' (type code), 'x' (price)
         """
         # Extract auction details
-        price = msg['price']              # Current asking price
-        p_type = msg['product_type']      # Fish type (H, S, or T)
-        p_id = msg['product_id']          # Unique product ID
-        op_id = msg['operator_id']        # Which operator is selling
+        price = msg['x']                  # Current asking price
+        type_idx = msg['k']               # Fish type code (TYPE_IDX slot)
+        p_id = msg['p']                   # Unique product ID
+        op_id = msg['o']                  # Which operator is selling
+        slot = op_id - 1                  # Pending-bid slot for this operator
         
         # ---- CHECK PENDING BIDS FOR THIS OPERATOR ----
         # We track pending bids PER OPERATOR to:
         # 1. Prevent spam (don't send multiple bids for same item)
         # 2. Allow parallel bidding (can bid on different operators simultaneously)
+        pending_pid = self.pending_pids[slot]
         
-        if op_id in self.pending_buy_pids:
-            pending_pid = self.pending_buy_pids[op_id]
-            
+        if pending_pid:
             if pending_pid != p_id:
                 # This is a NEW item from this operator (different from pending bid)
                 # This means we lost the previous auction (operator moved to next item)
                 # Clear the old pending bid and amount, then evaluate this new item
-                self.pending_buy_pids.pop(op_id)
-                self.pending_buy_amounts.pop(op_id, None)
+                self._clear_pending(slot)
             else:
                 # Still the SAME item we already bid on
                 # Don't send duplicate bids - wait for confirmation
@@ -616,88 +1151,48 @@ class Merchant(Agent):
         
         # ---- CALCULATE AVAILABLE BUDGET ----
         # When bidding on multiple items simultaneously, we must account for pending bids
-        # to avoid spending more than our total budget
-        pending_total = sum(self.pending_buy_amounts.values())
-        available_budget = self.budget - pending_total
+        # to avoid spending more than our total budget (running total, no per-message sum)
+        available_budget = self.budget - self.pending_total
         
-        # ---- BASIC BUDGET CHECK ----
+        # ---- FAST REJECT ----
+        # Prices start high in a Dutch auction, so most broadcasts are simply
+        # unaffordable: skip the strategy kernel for them (same result as its
+        # own first check). This must come AFTER the pending-bid check above,
+        # which releases the amount reserved for a lost bid.
         if price > available_budget:
-            return  # Can't afford this item (considering pending bids)
+            return
         
         # ---- GOAL-ORIENTED BUYING STRATEGY ----
-        should_buy = False
-        reason = ""  # For logging/debugging
-        
-        # Calculate how many types we still need to complete diversity goal
-        types_needed = len(FISH_TYPES) - len(self.types_owned)
-        
-        # ========================================
-        # PRIORITY 1: DIVERSITY - Get at least one of each type
-        # ========================================
-        if p_type not in self.types_owned:
-            # We need this type to achieve diversity goal!
-            
-            # BUDGET RESERVATION STRATEGY:
-            # Reserve enough budget for remaining missing types to ensure we can
-            # still afford them later. Estimate MIN_PRICE_MAX per missing type.
-            budget_to_reserve = (types_needed - 1) * MIN_PRICE_MAX
-            affordable_price = available_budget - budget_to_reserve
-            
-            if price <= affordable_price:
-                # Safe to buy: Have enough left for other missing types
-                should_buy = True
-                reason = f"DIVERSITY (need {p_type}, {types_needed} types left)"
-            elif types_needed > 0 and price <= available_budget * 0.4:
-                # Price is higher than safe amount, but still reasonable
-                # Buy anyway if not too expensive (max 40% of available budget per fish)
-                should_buy = True
-                reason = f"DIVERSITY_URGENT (need {p_type})"
-        
-        # ========================================
-        # PRIORITY 2: PREFERENCE SATISFACTION - Get more of preferred type
-        # ========================================
-        elif p_type == self.preference:
-            # We already have this type (diversity goal met for this type)
-            # Now focus on preference satisfaction: collect more of preferred type
-            
-            # BUDGET MANAGEMENT:
-            # Don't spend too much on non-critical purchases (max 60% of available budget)
-            # Keep some budget for diversity if we haven't completed that goal yet
-            if price <= available_budget * 0.6:
-                should_buy = True
-                reason = f"PREFERENCE (love {p_type})"
-        
-        # ========================================
-        # PRIORITY 3: OPPORTUNISTIC - Take bargains
-        # ========================================
-        elif price <= 15:
-            # Price is very low - good deal on any fish type
-            # Buy to maximize value even if not needed for goals
-            should_buy = True
-            reason = f"BARGAIN ({p_type} at {price})"
+        # Compiled kernel (see decide_bid / make_bid_decider): budget check + three priority levels
+        decision = self._decide(price, type_idx, self.owned_mask, available_budget)
         
         # ---- SEND BUY REQUEST ----
-        if should_buy:
-            self.log_info(f"{reason} - Bidding {price} for {p_type} from Op{op_id} (Available: {available_budget})")
-            
-            # Construct buy request message
-            req = {
-                'operator_id': op_id,
-                'product_id': p_id,
-                'merchant_id': self.merchant_id,
-                'msg': 'BUY'
-            }
+        if decision != BID_NONE:
+            # Build the human-readable reason only for bids we actually send (if verbose)
+            if self._verbose:
+                p_type = FISH_TYPES[type_idx]
+                if decision == BID_DIVERSITY:
+                    types_needed = TYPES_MISSING[self.owned_mask]
+                    reason = f"DIVERSITY (need {p_type}, {types_needed} types left)"
+                elif decision == BID_DIVERSITY_URGENT:
+                    reason = f"DIVERSITY_URGENT (need {p_type})"
+                elif decision == BID_PREFERENCE:
+                    reason = f"PREFERENCE (love {p_type})"
+                else:
+                    reason = f"BARGAIN ({p_type} at {price})"
+                self.log_info(f"{reason} - Bidding {price} for {p_type} from Op{op_id} (Available: {available_budget})")
             
-            # Send request to the correct operator via PUSH socket
+            # Send buy request (BUY_REQUEST struct) to the correct operator via PUSH socket
             # Each operator has a unique channel alias (e.g., sales_1, sales_2)
-            sales_alias = self.operator_connections.get(op_id, f'sales_{op_id}')
-            self.send(sales_alias, req)
+            sales_alias = self.operator_connections[op_id]
+            self.send(sales_alias, struct.pack(BUY_REQUEST, op_id, p_id, self.merchant_id))
             
             # Track this pending bid for this operator
             # Store both the product ID and the bid amount (for budget tracking)
             # Will be cleared when we receive SALE_CONFIRMATION (win or lose)
-            self.pending_buy_pids[op_id] = p_id
-            self.pending_buy_amounts[op_id] = price
+            self.pending_pids[slot] = p_id
+            self.pending_amounts[slot] = price
+            self.pending_total += price
 
 # ============================================================================
 # MAIN EXECUTION BLOCK
@@ -757,25 +1252,51 @@ if __name__ == '__main__':
     # This makes each auction unique and unpredictable.
     print(f"Starting {NUM_OPERATORS} Operators...")
     print(f"  Price ranges: Start ${START_PRICE_MIN}-${START_PRICE_MAX}, Min ${MIN_PRICE_MIN}-${MIN_PRICE_MAX}")
-    operators = []
-    product_id_counter = 1  # Ensures unique product IDs across all operators
     
-    for i in range(1, NUM_OPERATORS + 1):
-        op_name = f'Operator_{i}'
-        
+    # One independent child seed per agent (operators first, then merchants),
+    # all derived from RANDOM_SEED
+    agent_seeds = np.random.SeedSequence(RANDOM_SEED).spawn(NUM_OPERATORS + NUM_MERCHANTS)
+    
+    # Core each agent process is pinned to (see PIN_AGENTS_TO_CORES)
+    operator_cores, merchant_cores = assign_cores(NUM_OPERATORS, NUM_MERCHANTS)
+    
+    # Completion channel: every operator pushes its ID here when its auction
+    # finishes, so STEP 6 can wait for these notifications instead of polling
+    done_socket = zmq.Context.instance().socket(zmq.PULL)
+    done_port = done_socket.bind_to_random_port('tcp://127.0.0.1')
+    done_endpoint = f'127.0.0.1:{done_port}'
+    
+    # run_agent() cloudpickles the agent class, Numba kernels it references
+    # included. Numba sets up a kernel's pickling state lazily and not
+    # thread-safely, so pickle each class once here before starting agents
+    # from the thread pool
+    for agent_class in (Operator, Merchant):
+        cloudpickle.dumps(agent_class)
+    
+    def first_product_id(i):
+        """First product ID of operator i (ensures unique IDs across all operators)"""
+        return 1 + (i - 1) * FISH_PER_OPERATOR
+    
+    def start_operator(i):
+        """Create and configure operator i (runs in the startup thread pool)"""
         # Create the operator agent
-        op = run_agent(op_name, base=Operator)
+        op = run_agent(f'Operator_{i}', base=Operator,
+                       attributes={'seed': agent_seeds[i - 1], 'core': operator_cores[i - 1]})
         
         # Configure the operator
         op.set_log_file(abs_log_csv)         # Where to log transactions
         op.set_operator_id(i)                 # Unique operator ID
-        op.init_inventory(FISH_PER_OPERATOR, product_id_counter)  # Create fish with random prices
-        
-        # Update counter so next operator gets different product IDs
-        product_id_counter += FISH_PER_OPERATOR
-        
-        operators.append(op)
-        print(f"  Created {op_name} with {FISH_PER_OPERATOR} fish (IDs {product_id_counter - FISH_PER_OPERATOR} to {product_id_counter - 1})")
+        op.set_done_channel(done_endpoint)    # Where to report auction completion
+        op.init_inventory(FISH_PER_OPERATOR, first_product_id(i))  # Create fish with random prices
+        return op
+    
+    # Start all operators concurrently (map keeps them in operator ID order)
+    with ThreadPoolExecutor(max_workers=STARTUP_WORKERS) as pool:
+        operators = list(pool.map(start_operator, range(1, NUM_OPERATORS + 1)))
+    
+    for i in range(1, NUM_OPERATORS + 1):
+        first_id = first_product_id(i)
+        print(f"  Created Operator_{i} with {FISH_PER_OPERATOR} fish (IDs {first_id} to {first_id + FISH_PER_OPERATOR - 1})")
     
     # ========================================================================
     # STEP 4: CREATE MERCHANT AGENTS (BUYERS)
@@ -789,38 +1310,41 @@ if __name__ == '__main__':
     # - Uses goal-oriented strategy: diversity > preference > bargains
     # - Can bid on multiple items from different operators in parallel
     print(f"Starting {NUM_MERCHANTS} Merchants...")
-    merchants = []
+    setup_rows = []  # Setup CSV rows, written in one go after all merchants exist
     
     # Gather connection information from all operators.
-    # Each merchant needs two addresses per operator:
-    # - market address (SUB socket): for receiving auction broadcasts
+    # Each merchant needs three addresses per operator:
+    # - market address (SUB socket): for receiving sale confirmations
+    # - prices address (SUB socket): for receiving auction broadcasts (conflated)
     # - sales address (PUSH socket): for sending buy requests
-    operator_connections = [
-        (op.get_attr('operator_id'), op.addr('market'), op.addr('sales')) 
-        for op in operators
-    ]
+    # (one get_connection_info() call per operator instead of four proxy calls)
+    operator_connections = [op.get_connection_info() for op in operators]
+    
+    def start_merchant(i):
+        """Create merchant i, connected to all operators (runs in the startup thread pool)"""
+        # Create the merchant agent; it connects to all operators in on_init
+        # (operator addresses passed as an attribute, no separate setup call)
+        return run_agent(f'Merchant_{i}', base=Merchant,
+                         attributes={'seed': agent_seeds[NUM_OPERATORS + i - 1],
+                                     'core': merchant_cores[i - 1],
+                                     'operators': operator_connections})
     
-    for i in range(1, NUM_MERCHANTS + 1):
+    # Start all merchants concurrently (map keeps them in merchant ID order)
+    with ThreadPoolExecutor(max_workers=STARTUP_WORKERS) as pool:
+        merchants = list(pool.map(start_merchant, range(1, NUM_MERCHANTS + 1)))
+    
+    for i, m in enumerate(merchants, start=1):
         m_name = f'Merchant_{i}'
         
-        # Create the merchant agent
-        m = run_agent(m_name, base=Merchant)
-        
-        # Connect merchant to all operators
-        m.setup_connections(operator_connections)
-        
-        merchants.append(m)
-        
-        # Log this merchant's initial configuration to setup CSV
-        pref = m.get_attr('preference')  # Get randomly assigned preference
-        budg = m.get_attr('budget')      # Get starting budget
-        
-        with open(abs_setup_csv, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([m_name, pref, budg])
-            f.flush()
+        # Record this merchant's initial configuration for the setup CSV
+        pref, budg = m.get_setup()  # Randomly assigned preference and starting budget
+        setup_rows.append([m_name, pref, budg])
         
         print(f"  Created {m_name} (Preference: {pref}, Budget: {budg})")
+    
+    # Write all merchant configurations to the setup CSV (one open + write)
+    with open(abs_setup_csv, 'a', newline='') as f:
+        csv.writer(f).writerows(setup_rows)
 
     # ========================================================================
     # STEP 5: START ALL AUCTIONS
@@ -830,7 +1354,7 @@ if __name__ == '__main__':
     # Merchants listen to all operators and can bid on any active auction.
     print("Starting Auctions...")
     for op in operators:
-        op.start_auction()  # Activates the tick() timer (runs every TICK_INTERVAL)
+        op.start_auction()  # Arms the tick() deadline (runs every TICK_INTERVAL)
         print(f"  Operator {op.get_attr('operator_id')} auction started")
     
     # ========================================================================
@@ -847,19 +1371,18 @@ if __name__ == '__main__':
     # - All items sold, OR
     # - All items discarded (price fell below minimum)
     # 
-    # Main thread polls until ALL operators finish.
+    # Main thread waits until ALL operators have reported completion on the
+    # done channel (no per-second get_attr polling of every operator).
     try:
-        while True:
-            time.sleep(1)  # Check every second
-            
-            # Check if ALL operators have finished their auctions
-            all_finished = all(not op.get_attr('auction_active') for op in operators)
-            
-            if all_finished:
-                 print("All auctions finished.")
-                 time.sleep(2)  # Brief pause to ensure all final messages processed
-                 break
-                 
+        finished = set()
+        while len(finished) < NUM_OPERATORS:
+            # Wake up at least every second so Ctrl+C is handled promptly
+            if done_socket.poll(1000):
+                finished.add(msgpack.unpackb(done_socket.recv()))
+        
+        print("All auctions finished.")
+        time.sleep(2)  # Brief pause to ensure all final messages processed
+        
     except KeyboardInterrupt:
         # User pressed Ctrl+C to stop early
         print("\nInterrupted by user.")
@@ -869,4 +1392,5 @@ if __name__ == '__main__':
     finally:
         # Always clean up: shutdown nameserver and all agents
         print("Shutting down...")
+        done_socket.close(linger=0)
         ns.shutdown()
@@ -22,13 +22,21 @@ Each personality is encoded in the LLM system prompt.
 # IMPORTS
 # ============================================================================
 import time
+import asyncio
+import threading
 import csv
 import random
 import os
-import json
-import requests
+import struct
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+import zmq
+import msgpack
+import numpy as np
+import httpx
 from datetime import datetime
 from osbrain import run_agent, run_nameserver, Agent
+from osbrain.address import AgentAddress
 import osbrain
 from dotenv import load_dotenv
 
@@ -38,7 +46,24 @@ load_dotenv()
 # ============================================================================
 # SYSTEM CONFIGURATION
 # ============================================================================
-osbrain.config['SERIALIZER'] = 'json'
+# Set osBrain's default serializer to pickle (its native serializer) for any socket
+# that does not choose its own: faster and more compact than JSON for small dicts
+osbrain.config['SERIALIZER'] = 'pickle'
+
+# The auction channels (market, sales) are bound as 'raw' sockets and carry
+# msgpack-encoded dicts instead (1-byte tags and raw ints rather than JSON text).
+# Agents pack with msgpack.packb before sending and unpack in their handlers;
+# osBrain has no msgpack serializer of its own, hence 'raw'.
+# (Buy requests on the sales channel are a fixed struct instead, see BUY_REQUEST.)
+WIRE_SERIALIZER = 'raw'
+
+# Buy requests (merchant -> operator, sales channel) always carry the same three
+# integers, so they travel as a fixed 12-byte struct instead of a msgpack dict:
+#   operator_id, product_id, merchant_id (little-endian uint32)
+# (A format string rather than a struct.Struct: agent classes are cloudpickled
+# with the globals they use, and Struct objects cannot be pickled; the struct
+# module caches the compiled format anyway.)
+BUY_REQUEST = '<III'
 
 # ============================================================================
 # LLM CONFIGURATION
@@ -59,6 +84,16 @@ if not OPENROUTER_API_KEY:
 LLM_MODEL = os.getenv("LLM_MODEL", "mistralai/devstral-2512:free")
 LLM_TIMEOUT = 10  # seconds (increased for free models)
 
+# Merchants remember LLM decisions for situations they have already asked about
+# (same personality, fish type, price, types owned, preference and budget bucket)
+LLM_CACHE_SIZE = 4096          # Max remembered decisions per merchant
+LLM_CACHE_BUDGET_BUCKET = 10   # Available budgets within the same 10 share a cache entry
+
+# Reactive pre-filter: items a personality would clearly WAIT on never reach the LLM
+PREFILTER_CHEAP_PRICE = 15     # PREFERENCE_DRIVEN still asks about any fish at or below this
+CAUTIOUS_START_FRACTION = 0.7  # CAUTIOUS skips while price > 70% of the item's start price...
+CAUTIOUS_MIN_SEEN_FACTOR = 2   # ...and > 2x the lowest price seen for that type so far
+
 # ============================================================================
 # SIMULATION PARAMETERS
 # ============================================================================
@@ -67,12 +102,23 @@ NUM_MERCHANTS = 4  # Increased to show different personalities
 FISH_TYPES = ['H', 'S', 'T']
 FISH_PER_OPERATOR = 5
 
+# Types owned by a merchant are tracked as a bitmask (H=0b001, S=0b010, T=0b100)
+TYPE_BIT = {t: 1 << i for i, t in enumerate(FISH_TYPES)}
+ALL_TYPES_MASK = (1 << len(FISH_TYPES)) - 1  # Every type owned (diversity goal met)
+# Lookup tables: owned mask -> pre-formatted prompt text
+TYPES_OWNED_STR = [str([t for t in FISH_TYPES if mask & TYPE_BIT[t]]) if mask else 'None'
+                   for mask in range(ALL_TYPES_MASK + 1)]
+TYPES_MISSING_STR = [str([t for t in FISH_TYPES if not mask & TYPE_BIT[t]]) if mask != ALL_TYPES_MASK
+                     else 'None (I have all types!)'
+                     for mask in range(ALL_TYPES_MASK + 1)]
+
 START_PRICE_MIN = 40
 START_PRICE_MAX = 60
 MIN_PRICE_MIN = 5
 MIN_PRICE_MAX = 15
 PRICE_DECREMENT = 5
 TICK_INTERVAL = 1.0  # Slightly longer to allow LLM processing
+AUCTION_WAIT_TIMEOUT = 900  # Seconds main() waits for all auctions before giving up
 
 # ============================================================================
 # PERSONALITY DEFINITIONS
@@ -133,124 +179,258 @@ LOG_CSV = os.path.join(RESULTS_DIR, f"log_{DATE_STR}.csv")
 # ============================================================================
 # LLM HELPER FUNCTION
 # ============================================================================
-def call_llm_for_decision(system_prompt, user_prompt, timeout=LLM_TIMEOUT):
+LLM_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+_LLM_HEADERS = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+    "Content-Type": "application/json",
+}
+
+# HTTP/2 client for the LLM API: concurrent decisions (a merchant's worker
+# threads) are multiplexed as streams over one keep-alive TLS connection.
+# The client runs on its own asyncio event loop in a daemon thread; both are
+# created inside each agent process (osBrain forks the agents, and threads do
+# not survive a fork): LLMMerchant.on_init calls get_llm_runtime() before any
+# worker thread exists, so no lock is needed.
+# (A plain dict rather than a lock + globals: agent classes are cloudpickled
+# with the globals they use, and locks, loops and clients cannot be pickled.)
+_LLM_RUNTIME = {}
+
+def get_llm_runtime():
+    """Return this process's (event loop, HTTP/2 client), starting them on first call"""
+    if not _LLM_RUNTIME:
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name='llm-http', daemon=True).start()
+        _LLM_RUNTIME['loop'] = loop
+        _LLM_RUNTIME['client'] = httpx.AsyncClient(http2=True, headers=_LLM_HEADERS, timeout=LLM_TIMEOUT)
+    return _LLM_RUNTIME['loop'], _LLM_RUNTIME['client']
+
+async def _post_llm_request(client, body, timeout):
+    """Send one request body on the HTTP/2 client and return the raw response body"""
+    response = await client.post(LLM_API_URL, content=body, timeout=timeout)
+    return response.content
+
+# Structured-output schema sent with every request (identical for all merchants)
+LLM_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "auction_decision",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "action": {
+                    "type": "string",
+                    "enum": ["BUY", "WAIT"],
+                    "description": "Decision to buy or wait"
+                },
+                "reason": {
+                    "type": "string",
+                    "description": "Brief explanation of the decision"
+                }
+            },
+            "required": ["action", "reason"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Per-decision user prompt; only these fields change between auction items
+USER_PROMPT_TEMPLATE = """Current situation:
+- Fish Type: {p_type}
+- Current Price: {price}
+- My Budget: {available_budget} (total: {budget}, pending: {pending_total})
+- My Preference: {preference}
+- Types I Own: {types_owned}
+- Types Missing: {types_missing}
+- My Inventory Count: {inventory_count} fish
+- Is Preferred Type: {is_preferred}
+- Need for Diversity: {need_diversity}
+
+Should I buy this fish at the current price? Respond with your decision and reasoning."""
+
+_USER_CONTENT_SLOT = b'"\\u0000"'  # orjson.dumps form of the "\0" placeholder below
+
+def make_llm_body_template(system_prompt):
+    """
+    Pre-serialize the static part of the request body for one system prompt.
+    
+    The model, system message and response schema never change for a merchant,
+    so they are JSON-encoded once; each call only encodes the user prompt and
+    splices it in between the two halves.
+    
+    Returns:
+        (head, tail) bytes; the request body is head + json(user_prompt) + tail
+    """
+    body = orjson.dumps({
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "\0"},
+        ],
+        "response_format": LLM_RESPONSE_FORMAT,
+    })
+    head, tail = body.split(_USER_CONTENT_SLOT)
+    return head, tail
+
+def call_llm_for_decision(system_prompt, user_prompt, timeout=LLM_TIMEOUT, body_template=None):
     """
     Call the LLM API to get a buying decision.
     
+    Args:
+        system_prompt: Personality prompt (system message)
+        user_prompt: Current auction situation (user message)
+        timeout: HTTP timeout in seconds
+        body_template: (head, tail) from make_llm_body_template(system_prompt);
+                       built on the fly when not given
+    
     Returns:
         dict with 'action' ('BUY' or 'WAIT') and 'reason' (explanation)
-        Returns {'action': 'WAIT', 'reason': 'LLM error'} on failure
+        Returns {'action': 'WAIT', 'reason': 'LLM error', 'error': True} on failure
     """
+    head, tail = body_template or make_llm_body_template(system_prompt)
     try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": LLM_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "response_format": {
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "auction_decision",
-                        "strict": True,
-                        "schema": {
-                            "type": "object",
-                            "properties": {
-                                "action": {
-                                    "type": "string",
-                                    "enum": ["BUY", "WAIT"],
-                                    "description": "Decision to buy or wait"
-                                },
-                                "reason": {
-                                    "type": "string",
-                                    "description": "Brief explanation of the decision"
-                                }
-                            },
-                            "required": ["action", "reason"],
-                            "additionalProperties": False
-                        }
-                    }
-                }
-            },
-            timeout=timeout
-        )
+        # Blocking wrapper: the request itself runs on the LLM event loop thread
+        body = head + orjson.dumps(user_prompt) + tail
+        loop, client = get_llm_runtime()
+        content = asyncio.run_coroutine_threadsafe(
+            _post_llm_request(client, body, timeout), loop
+        ).result()
         
-        data = response.json()
+        data = orjson.loads(content)
         
         # Check for API errors
         if 'error' in data:
             error_msg = data['error'].get('message', 'Unknown API error')
             print(f"⚠️  API Error: {error_msg}")
-            return {'action': 'WAIT', 'reason': f'API error: {error_msg[:30]}'}
+            return {'action': 'WAIT', 'reason': f'API error: {error_msg[:30]}', 'error': True}
         
         # Check if response has expected structure
         if 'choices' not in data:
             print(f"⚠️  Unexpected API response: {data}")
-            return {'action': 'WAIT', 'reason': 'Invalid API response'}
+            return {'action': 'WAIT', 'reason': 'Invalid API response', 'error': True}
         
         decision_str = data["choices"][0]["message"]["content"]
-        decision = json.loads(decision_str)
+        decision = orjson.loads(decision_str)
         
         # Validate the decision
         if decision.get('action') not in ['BUY', 'WAIT']:
-            return {'action': 'WAIT', 'reason': 'Invalid LLM response'}
+            return {'action': 'WAIT', 'reason': 'Invalid LLM response', 'error': True}
             
         return decision
         
-    except requests.exceptions.Timeout:
-        return {'action': 'WAIT', 'reason': 'LLM timeout'}
+    except httpx.TimeoutException:
+        return {'action': 'WAIT', 'reason': 'LLM timeout', 'error': True}
     except KeyError as e:
         print(f"⚠️  API response missing key: {e}")
-        return {'action': 'WAIT', 'reason': f'Missing key: {str(e)[:30]}'}
+        return {'action': 'WAIT', 'reason': f'Missing key: {str(e)[:30]}', 'error': True}
     except Exception as e:
         print(f"⚠️  LLM Error: {type(e).__name__}: {str(e)[:100]}")
-        return {'action': 'WAIT', 'reason': f'{type(e).__name__}: {str(e)[:30]}'}
+        return {'action': 'WAIT', 'reason': f'{type(e).__name__}: {str(e)[:30]}', 'error': True}
 
 # ============================================================================
 # OPERATOR CLASS
 # ============================================================================
 class Operator(Agent):
     def on_init(self):
-        self.bind('PUB', alias='market')
-        self.bind('PULL', alias='sales', handler='handle_buy')
-        self.inventory = []
+        self.bind('PUB', alias='market', serializer=WIRE_SERIALIZER)
+        self.bind('PULL', alias='sales', handler='handle_buy', serializer=WIRE_SERIALIZER)
+        # Inventory as parallel per-field sequences (struct-of-arrays), indexed by
+        # current_item_idx: product IDs, types, starting and minimum prices
+        self.inv_ids = []
+        self.inv_types = []
+        self.inv_starts = []
+        self.inv_mins = []
+        self.inv_num_ticks = []   # Broadcasts per item before it is discarded
+        self.num_items = 0
         self.current_item_idx = 0
-        self.current_price = 0
+        self.current_tick_in_item = 0  # Broadcasts already made for the current item
+        self.current_price = 0         # Last broadcast price of the current item
         self.auction_active = False
         self.is_sold = False
-        # Use global variable for log file
+        # Log file: main() sets it with set_log_file (GLOBAL_LOG_FILE is only the default)
         self.log_filename = GLOBAL_LOG_FILE
         self.operator_id = 1
+        # Per-agent generator, created here (in the agent's own process) so every
+        # operator draws a different inventory from fresh OS entropy
+        self._rng = np.random.default_rng()
+        # One persistent handle and csv.writer for the whole run (64 KiB buffer),
+        # opened on first flush. Rows are collected in _sale_rows during the
+        # auction and written in one writerows() call when it ends (see flush_log)
+        self._log_fh = None
+        self._log_writer = None
+        self._sale_rows = []
+        # Market messages are reused: tick / handle_buy only refresh the
+        # per-item fields before packing instead of building a new dict
+        self._tick_msg = {
+            'type': 'AUCTION_ITEM',
+            'operator_id': self.operator_id,
+            'product_id': 0,
+            'product_type': '',
+            'price': 0
+        }
+        self._sale_msg = {
+            'type': 'SALE_CONFIRMATION',
+            'operator_id': self.operator_id,
+            'product_id': 0,
+            'product_type': '',
+            'merchant_id': 0,
+            'price': 0,
+            'msg': 'SOLD'
+        }
 
+    def set_log_file(self, filename):
+        """Set the CSV file where transactions will be logged"""
+        self.log_filename = filename
+    
     def set_operator_id(self, op_id):
         self.operator_id = op_id
+        self._tick_msg['operator_id'] = op_id
+        self._sale_msg['operator_id'] = op_id
+    
+    def set_done_channel(self, endpoint):
+        """
+        Connect to the main process's completion channel.
+        When the auction finishes, the operator pushes its operator_id there
+        (see tick), so main() doesn't have to poll every operator.
+        
+        Args:
+            endpoint: Address of the main process's PULL socket ('host:port', TCP)
+        """
+        self.connect(AgentAddress('tcp', endpoint, 'PULL', 'server', WIRE_SERIALIZER), alias='done')
+    
+    def get_connection_info(self):
+        """
+        Return everything a merchant needs to connect to this operator, in a
+        single call (one proxy round-trip instead of one per field).
+        
+        Returns:
+            Tuple (operator_id, market_addr, sales_addr), as expected by
+            LLMMerchant.setup_connections()
+        """
+        return (self.operator_id, self.addr('market'), self.addr('sales'))
     
     def init_inventory(self, num_fish, start_product_id):
-        self.inventory = []
-        for i in range(num_fish):
-            start_price = random.randint(START_PRICE_MIN, START_PRICE_MAX)
-            min_price = random.randint(MIN_PRICE_MIN, MIN_PRICE_MAX)
-            
-            if start_price <= min_price:
-                start_price = min_price + 2 * PRICE_DECREMENT
-            
-            self.inventory.append({
-                'id': start_product_id + i,
-                'type': random.choice(FISH_TYPES),
-                'start_price': start_price,
-                'min_price': min_price
-            })
+        # One vectorized draw per field (each fish still gets independent values)
+        start_prices = self._rng.integers(START_PRICE_MIN, START_PRICE_MAX + 1, num_fish)
+        min_prices = self._rng.integers(MIN_PRICE_MIN, MIN_PRICE_MAX + 1, num_fish)
+        types = self._rng.integers(0, len(FISH_TYPES), num_fish)
+        
+        start_prices = np.where(start_prices <= min_prices, min_prices + 2 * PRICE_DECREMENT, start_prices)
+        
+        # Stored as plain lists (tolist): indexing them yields Python ints, which
+        # msgpack and csv take directly, and is cheaper than NumPy scalar access
+        self.inv_ids = list(range(start_product_id, start_product_id + num_fish))
+        self.inv_types = [FISH_TYPES[t] for t in types.tolist()]
+        self.inv_starts = start_prices.tolist()
+        self.inv_mins = min_prices.tolist()
+        # Closed-form price schedule: item i is broadcast at inv_starts[i] - k * PRICE_DECREMENT
+        # for k = 0 .. inv_num_ticks[i] - 1 (every price >= its minimum), then discarded
+        self.inv_num_ticks = ((start_prices - min_prices) // PRICE_DECREMENT + 1).tolist()
+        self.num_items = num_fish
 
     def start_auction(self):
         self.auction_active = True
-        if len(self.inventory) > 0:
-            self.current_price = self.inventory[0]['start_price']
         self.each(TICK_INTERVAL, 'tick')
         self.log_info("Auction started!")
 
@@ -258,76 +438,96 @@ class Operator(Agent):
         if not self.auction_active:
             return
         
-        if self.current_item_idx >= len(self.inventory):
+        idx = self.current_item_idx
+        if idx >= self.num_items:
             self.auction_active = False
+            self.flush_log()
             self.log_info("Auction finished. No more items.")
+            if 'done' in self._socket:
+                self.send('done', msgpack.packb(self.operator_id))  # Notify main()
             return
 
-        item = self.inventory[self.current_item_idx]
-        
-        if self.current_price < item['min_price']:
-            self.log_info(f"Item {item['id']} ({item['type']}) discarded (price {self.current_price} below minimum {item['min_price']}).")
-            self.log_sale(item['id'], item['type'], 0, "")
+        p_id = self.inv_ids[idx]
+        p_type = self.inv_types[idx]
+        step = self.current_tick_in_item
+        price = self.inv_starts[idx] - step * PRICE_DECREMENT
+        
+        if step == self.inv_num_ticks[idx]:
+            # Schedule exhausted: this price would be below the minimum
+            self.log_info(f"Item {p_id} ({p_type}) discarded (price {price} below minimum {self.inv_mins[idx]}).")
+            self.log_sale(p_id, p_type, 0, "")
             self.next_item()
             return
         
-        msg = {
-            'type': 'AUCTION_ITEM',
-            'operator_id': self.operator_id,
-            'product_id': item['id'],
-            'product_type': item['type'],
-            'price': self.current_price
-        }
-        self.send('market', msg)
-        self.log_info(f"Broadcasting: Item {item['id']} ({item['type']}) at {self.current_price}")
+        msg = self._tick_msg
+        msg['product_id'] = p_id
+        msg['product_type'] = p_type
+        msg['price'] = price
+        self.send('market', msgpack.packb(msg))
+        self.log_info(f"Broadcasting: Item {p_id} ({p_type}) at {price}")
         
-        self.current_price -= PRICE_DECREMENT
+        self.current_price = price
+        self.current_tick_in_item = step + 1
 
     def next_item(self):
         self.current_item_idx += 1
+        self.current_tick_in_item = 0
         self.is_sold = False
-        if self.current_item_idx < len(self.inventory):
-            self.current_price = self.inventory[self.current_item_idx]['start_price']
         
-    def handle_buy(self, msg):
+    def handle_buy(self, data):
         if not self.auction_active:
             return
         
-        if self.current_item_idx >= len(self.inventory):
+        idx = self.current_item_idx
+        if idx >= self.num_items:
             return
         
-        current_item = self.inventory[self.current_item_idx]
-        req_pid = msg.get('product_id')
-        m_id = msg.get('merchant_id', 'Unknown')
+        _, req_pid, m_id = struct.unpack(BUY_REQUEST, data)
+        p_id = self.inv_ids[idx]
+        p_type = self.inv_types[idx]
         
-        if req_pid == current_item['id'] and not self.is_sold:
-            sale_price = self.current_price + PRICE_DECREMENT
+        if req_pid == p_id and not self.is_sold:
+            sale_price = self.current_price
             self.is_sold = True
             
-            self.log_info(f"SOLD item {current_item['id']} to {m_id} for {sale_price}")
-            self.log_sale(current_item['id'], current_item['type'], sale_price, m_id)
+            self.log_info(f"SOLD item {p_id} to {m_id} for {sale_price}")
+            self.log_sale(p_id, p_type, sale_price, m_id)
             
-            confirmation = {
-                'type': 'SALE_CONFIRMATION',
-                'operator_id': self.operator_id,
-                'product_id': current_item['id'],
-                'product_type': current_item['type'],
-                'merchant_id': m_id,
-                'price': sale_price,
-                'msg': 'SOLD'
-            }
-            self.send('market', confirmation)
+            confirmation = self._sale_msg
+            confirmation['product_id'] = p_id
+            confirmation['product_type'] = p_type
+            confirmation['merchant_id'] = m_id
+            confirmation['price'] = sale_price
+            self.send('market', msgpack.packb(confirmation))
             self.next_item()
 
     def log_sale(self, product_id, product_type, price, merchant_id):
+        self._sale_rows.append((self.operator_id, product_id, product_type, price, merchant_id))
+
+    def flush_log(self):
+        """Write all buffered transaction rows to the CSV log in one batch (opened on first use)"""
+        if not self._sale_rows:
+            return
         try:
-            with open(self.log_filename, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([self.operator_id, product_id, product_type, price, merchant_id])
-                f.flush()
+            if self._log_fh is None:
+                self._log_fh = open(self.log_filename, 'a', newline='', buffering=1 << 16)
+                self._log_writer = csv.writer(self._log_fh)
+            self._log_writer.writerows(self._sale_rows)
+            self._log_fh.flush()
+            self._sale_rows.clear()
         except Exception as e:
             self.log_info(f"Error writing log: {e}")
 
+    def shutdown(self):
+        """Flush, sync and close the transaction log before the agent shuts down"""
+        self.flush_log()  # Rows of an auction interrupted before it finished
+        if self._log_fh is not None:
+            self._log_fh.flush()
+            os.fsync(self._log_fh.fileno())
+            self._log_fh.close()
+            self._log_fh = None
+        super().shutdown()
+
 # ============================================================================
 # LLM-AUGMENTED MERCHANT CLASS
 # ============================================================================
@@ -348,12 +548,23 @@ class LLMMerchant(Agent):
         self.merchant_id = int(self.name.split('_')[-1]) if '_' in self.name else random.randint(100, 999)
         
         # Goal tracking
-        self.types_owned = set()
+        self.types_owned_mask = 0  # Bitmask of types won (see TYPE_BIT)
         
         # State tracking
-        self.pending_buy_pids = {}
-        self.pending_buy_amounts = {}
+        self.pending_buys = [None] * (NUM_OPERATORS + 1)  # op_id -> (product_id, amount) or None
+        self._pending_total = 0   # Running sum of pending amounts (see _clear_pending)
         self.operator_connections = {}
+        self.current_items = {}   # op_id -> product_id on sale right now (None once sold)
+        self.deciding = {}        # op_id -> product_id with an LLM call in flight
+        self._decision_cache = {} # Situation key -> LLM decision (see LLM_CACHE_SIZE)
+        self._item_start = {}     # op_id -> (product_id, first price seen = start price)
+        self._min_price_seen = {} # Fish type -> lowest price broadcast so far (any operator)
+        
+        # LLM calls run on worker threads so the agent keeps handling market
+        # messages meanwhile; decisions come back to the agent's own thread
+        # through safe_call (see _deliberate / _finish_decision)
+        self._llm_pool = ThreadPoolExecutor(max_workers=2)
+        get_llm_runtime()  # Start this process's HTTP/2 client loop (see _LLM_RUNTIME)
         
         # LLM-specific attributes
         self.personality = None
@@ -369,6 +580,12 @@ class LLMMerchant(Agent):
             self.log_info(f"Unknown personality: {personality_name}, using BALANCED")
             self.personality = 'BALANCED'
             self.system_prompt = PERSONALITIES['BALANCED']['system_prompt']
+        # Static JSON of every LLM request for this personality (see make_llm_body_template)
+        self._llm_body_template = make_llm_body_template(self.system_prompt)
+        
+    def get_setup(self):
+        """Return (preference, budget) for the setup CSV in one proxy call"""
+        return (self.preference, self.budget)
         
     def setup_connections(self, operators):
         """Connect to all operators"""
@@ -378,8 +595,9 @@ class LLMMerchant(Agent):
             self.connect(sales_addr, alias=sales_alias)
             self.operator_connections[op_id] = sales_alias
         
-    def handle_market(self, msg):
-        """Route messages from operators"""
+    def handle_market(self, data):
+        """Route messages from operators (raw msgpack frames, see WIRE_SERIALIZER)"""
+        msg = msgpack.unpackb(data)
         msg_type = msg.get('type')
         
         if msg_type == 'SALE_CONFIRMATION':
@@ -393,21 +611,30 @@ class LLMMerchant(Agent):
         product_id = msg.get('product_id')
         product_type = msg.get('product_type')
         
+        if self.current_items.get(op_id) == product_id:
+            self.current_items[op_id] = None  # Sold: late LLM decisions on it are dropped
+        
         if msg.get('merchant_id') == self.merchant_id:
             price = msg['price']
             self.budget -= price
             self.inventory.append({'id': product_id, 'price': price, 'type': product_type})
-            self.types_owned.add(product_type)
+            self.types_owned_mask |= TYPE_BIT[product_type]
             
-            self.log_info(f"[{self.personality}] WON {product_type} (item {product_id}) for {price}. Budget: {self.budget}. Types: {self.types_owned}")
+            self.log_info(f"[{self.personality}] WON {product_type} (item {product_id}) for {price}. Budget: {self.budget}. Types: {TYPES_OWNED_STR[self.types_owned_mask]}")
             
-            self.pending_buy_pids.pop(op_id, None)
-            self.pending_buy_amounts.pop(op_id, None)
+            self._clear_pending(op_id)
         else:
-            if self.pending_buy_pids.get(op_id) == product_id:
+            pending = self.pending_buys[op_id]
+            if pending is not None and pending[0] == product_id:
                 self.log_info(f"[{self.personality}] Lost item {product_id} to Merchant {msg.get('merchant_id')}")
-                self.pending_buy_pids.pop(op_id, None)
-                self.pending_buy_amounts.pop(op_id, None)
+                self._clear_pending(op_id)
+
+    def _clear_pending(self, op_id):
+        """Forget the pending bid on an operator and release its amount from the running total"""
+        pending = self.pending_buys[op_id]
+        if pending is not None:
+            self._pending_total -= pending[1]
+            self.pending_buys[op_id] = None
 
     def handle_auction_item(self, msg):
         """
@@ -419,76 +646,155 @@ class LLMMerchant(Agent):
         p_type = msg['product_type']
         p_id = msg['product_id']
         op_id = msg['operator_id']
+        self.current_items[op_id] = p_id
+        
+        # Market observations for the pre-filter
+        start = self._item_start.get(op_id)
+        if start is None or start[0] != p_id:
+            start = self._item_start[op_id] = (p_id, price)
+        if price < self._min_price_seen.get(p_type, price + 1):
+            self._min_price_seen[p_type] = price
+        
+        # Still waiting for the LLM on this item: its lower price is
+        # considered at the next tick after the decision comes back
+        if self.deciding.get(op_id) == p_id:
+            return
         
         # Check pending bids
-        if op_id in self.pending_buy_pids:
-            pending_pid = self.pending_buy_pids[op_id]
-            if pending_pid != p_id:
-                self.pending_buy_pids.pop(op_id)
-                self.pending_buy_amounts.pop(op_id, None)
+        pending = self.pending_buys[op_id]
+        if pending is not None:
+            if pending[0] != p_id:
+                self._clear_pending(op_id)
             else:
                 return
         
         # Calculate available budget
-        pending_total = sum(self.pending_buy_amounts.values())
+        pending_total = self._pending_total
         available_budget = self.budget - pending_total
         
         # Basic budget check
         if price > available_budget:
             return
         
+        # Cheap personality-specific short-circuit (the LLM decides everything else)
+        if self._prefilter_skip(p_type, price, start[1]):
+            return
+        
         # ========================================
         # LLM REASONING LAYER
         # ========================================
-        # Construct prompt with current state
-        types_missing = [t for t in FISH_TYPES if t not in self.types_owned]
+        # Same situation seen before: reuse the decision instead of asking again
+        owned_mask = self.types_owned_mask
+        is_missing = not owned_mask & TYPE_BIT[p_type]
+        cache_key = (self.personality, p_type, price, owned_mask,
+                     self.preference, available_budget // LLM_CACHE_BUDGET_BUCKET)
+        cached = self._decision_cache.get(cache_key)
+        if cached is not None:
+            self._finish_decision(cached, op_id, p_id, p_type, price)
+            return
         
-        user_prompt = f"""Current situation:
-- Fish Type: {p_type}
-- Current Price: {price}
-- My Budget: {available_budget} (total: {self.budget}, pending: {pending_total})
-- My Preference: {self.preference}
-- Types I Own: {list(self.types_owned) if self.types_owned else 'None'}
-- Types Missing: {types_missing if types_missing else 'None (I have all types!)'}
-- My Inventory Count: {len(self.inventory)} fish
-- Is Preferred Type: {'YES' if p_type == self.preference else 'NO'}
-- Need for Diversity: {'YES (missing this type!)' if p_type not in self.types_owned else 'NO (already have this type)'}
+        # Construct prompt with current state
+        user_prompt = USER_PROMPT_TEMPLATE.format(
+            p_type=p_type,
+            price=price,
+            available_budget=available_budget,
+            budget=self.budget,
+            pending_total=pending_total,
+            preference=self.preference,
+            types_owned=TYPES_OWNED_STR[owned_mask],
+            types_missing=TYPES_MISSING_STR[owned_mask],
+            inventory_count=len(self.inventory),
+            is_preferred='YES' if p_type == self.preference else 'NO',
+            need_diversity='YES (missing this type!)' if is_missing else 'NO (already have this type)',
+        )
 
-Should I buy this fish at the current price? Respond with your decision and reasoning."""
+        # Hand the LLM call to a worker thread; the decision is acted on in _finish_decision
+        self.deciding[op_id] = p_id
+        self._llm_pool.submit(self._deliberate, user_prompt, op_id, p_id, p_type, price, cache_key)
 
-        # Call LLM for decision
-        decision = call_llm_for_decision(self.system_prompt, user_prompt)
+    def _prefilter_skip(self, p_type, price, start_price):
+        """
+        Return True for items this personality would clearly WAIT on, so they
+        are not sent to the LLM. Only unambiguous cases are filtered:
+        
+        - PREFERENCE_DRIVEN: not the preferred type, already owned (no
+          diversity need) and not a bargain (price > PREFILTER_CHEAP_PRICE)
+        - CAUTIOUS: the price has barely started dropping (> CAUTIOUS_START_FRACTION
+          of the start price) and this type has already been offered far cheaper
+          (> CAUTIOUS_MIN_SEEN_FACTOR x the lowest broadcast price seen), unless
+          the type is still missing
+        """
+        if self.personality == 'PREFERENCE_DRIVEN':
+            return (p_type != self.preference and self.types_owned_mask & TYPE_BIT[p_type] != 0
+                    and price > PREFILTER_CHEAP_PRICE)
+        if self.personality == 'CAUTIOUS':
+            return (self.types_owned_mask & TYPE_BIT[p_type] != 0
+                    and price > CAUTIOUS_START_FRACTION * start_price
+                    and price > CAUTIOUS_MIN_SEEN_FACTOR * self._min_price_seen[p_type])
+        return False
+
+    def _deliberate(self, user_prompt, op_id, p_id, p_type, price, cache_key):
+        """
+        Worker-thread half of a decision: call the LLM and pass the result
+        back to the agent's thread (sockets must only be used from there).
+        """
+        decision = call_llm_for_decision(self.system_prompt, user_prompt,
+                                         body_template=self._llm_body_template)
+        try:
+            self.safe_call('_finish_decision', decision, op_id, p_id, p_type, price, cache_key)
+        except Exception:
+            return  # Agent already shutting down
+        
+        # Respect API rate limits - add delay after each LLM call to avoid 429 errors
+        # This is especially important with multiple merchants making concurrent decisions
+        # (only this worker waits; the agent keeps processing messages)
+        time.sleep(2.0)
+
+    def _finish_decision(self, decision, op_id, p_id, p_type, price, cache_key=None):
+        """
+        Act on an LLM decision (runs on the agent's thread via safe_call).
+        
+        The market may have moved on while the LLM was thinking, so the item
+        must still be on sale and affordable before a BUY is sent.
+        Fresh decisions (cache_key given) are remembered unless the call failed.
+        """
+        if self.deciding.get(op_id) == p_id:
+            del self.deciding[op_id]
+        
+        if cache_key is not None and not decision.get('error'):
+            if len(self._decision_cache) >= LLM_CACHE_SIZE:
+                del self._decision_cache[next(iter(self._decision_cache))]  # Evict oldest entry
+            self._decision_cache[cache_key] = decision
         
         action = decision.get('action', 'WAIT')
         reason = decision.get('reason', 'No reason provided')
         
         self.log_info(f"[{self.personality}] LLM Decision for {p_type}@{price}: {action} - {reason}")
         
-        # Respect API rate limits - add delay after each LLM call to avoid 429 errors
-        # This is especially important with multiple merchants making concurrent decisions
-        time.sleep(2.0)
-        
         # ========================================
         # ACT ON LLM DECISION
         # ========================================
         if action == 'BUY':
-            # Send buy request
-            req = {
-                'operator_id': op_id,
-                'product_id': p_id,
-                'merchant_id': self.merchant_id,
-                'msg': 'BUY'
-            }
+            if self.current_items.get(op_id) != p_id or self.pending_buys[op_id] is not None:
+                return  # Item sold/replaced meanwhile, or already bidding on this operator
+            if price > self.budget - self._pending_total:
+                return  # Budget committed elsewhere meanwhile
             
-            sales_alias = self.operator_connections.get(op_id, f'sales_{op_id}')
-            self.send(sales_alias, req)
+            # Send buy request (BUY_REQUEST struct)
+            sales_alias = self.operator_connections[op_id]
+            self.send(sales_alias, struct.pack(BUY_REQUEST, op_id, p_id, self.merchant_id))
             
             # Track pending bid
-            self.pending_buy_pids[op_id] = p_id
-            self.pending_buy_amounts[op_id] = price
+            self.pending_buys[op_id] = (p_id, price)
+            self._pending_total += price
             
             self.log_info(f"[{self.personality}] BUYING {p_type} for {price} from Op{op_id}")
 
+    def shutdown(self):
+        """Drop queued LLM calls (in-flight ones finish on their own) and shut down"""
+        self._llm_pool.shutdown(wait=False, cancel_futures=True)
+        super().shutdown()
+
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
@@ -532,6 +838,12 @@ if __name__ == '__main__':
         ns.shutdown()
         exit(1)
 
+    # Completion channel: every operator pushes its ID here when its auction
+    # finishes, so main() can wait for these notifications instead of polling
+    done_socket = zmq.Context.instance().socket(zmq.PULL)
+    done_port = done_socket.bind_to_random_port('tcp://127.0.0.1')
+    done_endpoint = f'127.0.0.1:{done_port}'
+    
     # Create operators
     print(f"\nStarting {NUM_OPERATORS} Operators...")
     operators = []
@@ -542,6 +854,8 @@ if __name__ == '__main__':
         try:
             op = run_agent(op_name, base=Operator)
             op.set_operator_id(i)
+            op.set_log_file(abs_log_csv)
+            op.set_done_channel(done_endpoint)
             op.init_inventory(FISH_PER_OPERATOR, product_id_counter)
             product_id_counter += FISH_PER_OPERATOR
             operators.append(op)
@@ -554,13 +868,12 @@ if __name__ == '__main__':
     # Create LLM-augmented merchants with different personalities
     print(f"\nStarting {NUM_MERCHANTS} LLM-Augmented Merchants...")
     merchants = []
-    operator_connections = [
-        (op.get_attr('operator_id'), op.addr('market'), op.addr('sales')) 
-        for op in operators
-    ]
+    # (one get_connection_info() call per operator instead of three proxy calls)
+    operator_connections = [op.get_connection_info() for op in operators]
     
     # Assign personalities cyclically
     personality_names = list(PERSONALITIES.keys())
+    setup_rows = []  # Setup CSV rows, written in one go after all merchants exist
     
     for i in range(1, NUM_MERCHANTS + 1):
         m_name = f'Merchant_{i}'
@@ -575,26 +888,27 @@ if __name__ == '__main__':
             merchants.append(m)
             
             # Log setup
-            pref = m.get_attr('preference')
-            budg = m.get_attr('budget')
-            
-            with open(abs_setup_csv, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([m_name, personality, pref, budg])
-                f.flush()
+            pref, budg = m.get_setup()
+            setup_rows.append([m_name, personality, pref, budg])
             
             print(f"  Created {m_name} | Personality: {personality:20s} | Preference: {pref} | Budget: {budg}")
         except Exception as e:
             print(f"Error creating merchant {m_name}: {e}")
             ns.shutdown()
             exit(1)
+    
+    with open(abs_setup_csv, 'a', newline='') as f:
+        csv.writer(f).writerows(setup_rows)
 
-    # Start auctions
+    # Start auctions (all at once from a thread pool, so the start_auction
+    # round-trips to the operator processes overlap instead of adding up)
     print("\nStarting Auctions...")
-    for op in operators:
+    with ThreadPoolExecutor(max_workers=NUM_OPERATORS) as pool:
+        started = [pool.submit(op.start_auction) for op in operators]
+    for op_id, future in enumerate(started, start=1):  # operators are in operator ID order
         try:
-            op.start_auction()
-            print(f"  Operator {op.get_attr('operator_id')} auction started")
+            future.result()
+            print(f"  Operator {op_id} auction started")
         except Exception as e:
             print(f"Error starting auction: {e}")
     
@@ -602,18 +916,24 @@ if __name__ == '__main__':
     print("AUCTION IN PROGRESS - LLM agents are making decisions...")
     print("=" * 80)
     
-    # Wait for completion
+    # Wait for completion: every operator reports on the done channel
+    # (no per-second get_attr polling of every operator)
     try:
-        while True:
-            time.sleep(1)
-            all_finished = all(not op.get_attr('auction_active') for op in operators)
-            if all_finished:
-                print("\n" + "=" * 80)
-                print("All auctions finished!")
-                print("=" * 80)
-                print("Waiting for agents to complete final processing...")
-                time.sleep(5)  # Give agents time to finish any pending LLM calls
+        finished = set()
+        deadline = time.monotonic() + AUCTION_WAIT_TIMEOUT
+        while len(finished) < NUM_OPERATORS:
+            if time.monotonic() > deadline:
+                print(f"\n⚠️  Auctions still running after {AUCTION_WAIT_TIMEOUT}s, stopping.")
                 break
+            # Wake up at least every second so Ctrl+C is handled promptly
+            if done_socket.poll(1000):
+                finished.add(msgpack.unpackb(done_socket.recv()))
+        else:
+            print("\n" + "=" * 80)
+            print("All auctions finished!")
+            print("=" * 80)
+            print("Waiting for agents to complete final processing...")
+            time.sleep(5)  # Give agents time to finish any pending LLM calls
                  
     except KeyboardInterrupt:
         print("\nInterrupted by user.")
@@ -621,6 +941,7 @@ if __name__ == '__main__':
         print(f"Runtime error: {e}")
     finally:
         print("\nShutting down agents...")
+        done_socket.close(linger=0)
         print(f"Results saved to:")
         print(f"  - {abs_setup_csv}")
         print(f"  - {abs_log_csv}")
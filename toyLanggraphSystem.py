@@ -9,7 +9,7 @@ a structured graph-based workflow where state is shared and managed centrally.
 
 ARCHITECTURE:
 -------------
-The system is modeled as a state machine with the following nodes:
+The system is modeled as a state machine with the following steps:
 1. OPERATOR_NODE: Manages the auction flow, updates prices, and broadcasts items.
 2. MERCHANTS_NODE: Represents the collective of buyer agents. Each merchant
    independently evaluates the current item using LLM reasoning.
@@ -18,10 +18,14 @@ The system is modeled as a state machine with the following nodes:
 
 GRAPH FLOW:
 -----------
-[START] -> [OPERATOR] -> [MERCHANTS] -> [EVALUATOR] --+
-              ^                                       |
-              |                                       |
-              +-----------------(Loop)----------------+
+[START] -> [AUCTION] -> [END]
+
+The AUCTION node runs the round loop itself, so a round costs no graph
+scheduling (one superstep per auction instead of three per round):
+
+   +-> OPERATOR -> MERCHANTS -> EVALUATOR --+
+   |                                        |
+   +------------------(Loop)----------------+  (until the inventory is empty)
 
 STATE MANAGEMENT:
 -----------------
@@ -43,13 +47,26 @@ DIFFERENCES FROM CLASSICAL/LLM VERSIONS:
 # IMPORTS
 # ============================================================================
 import os
+import sys
 import csv
-import json
+import re
+import socket
+import orjson
 import time
-import random
-import requests
+import queue
+import logging
+import logging.handlers
+import threading
+import atexit
+import asyncio
+import functools
+import httpx
+import numpy as np
+from numba import njit
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import TypedDict, List, Dict, Deque, Set, Any, Optional
 from langgraph.graph import StateGraph, START, END
 from dotenv import load_dotenv
 
@@ -71,12 +88,47 @@ if not OPENROUTER_API_KEY:
 
 LLM_MODEL = os.getenv("LLM_MODEL", "mistralai/devstral-2512:free")
 LLM_TIMEOUT = 10
+LLM_CONNECT_TIMEOUT = 3.0  # Seconds to open a connection (DNS + TCP + TLS); fails fast into a retry
 LLM_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# Merchant thresholds are requested concurrently; these bound the load
+LLM_MAX_CONCURRENCY = 4        # Requests in flight at once
+LLM_REQUESTS_PER_MINUTE = 20   # Provider rate limit (OpenRouter free tier: 20 RPM)
+LLM_KEEPALIVE_EXPIRY = 30.0    # Seconds an idle connection is kept (outlasts the gaps between rounds)
+LLM_RATE_BURST = 4             # Requests that may start back to back before the rate applies
+LLM_MAX_RETRIES = 3            # Retries of a request that failed transiently (429, 5xx, timeout)
+LLM_BACKOFF_INITIAL = 0.5      # First retry delay in seconds, doubled on each retry...
+LLM_BACKOFF_MAX = 8.0          # ...up to this, plus a random jitter of up to the same amount
+
+# Several merchants are asked in one batched request; one generation serves them all,
+# so reasons are kept short and the output is bounded per merchant
+LLM_BATCH_REASON_WORDS = 8           # Max words per reason in a batched answer
+LLM_BATCH_TOKENS_PER_MERCHANT = 40   # max_tokens budget per merchant in a batch
+LLM_BATCH_WINDOW = 0.02              # Seconds a request waits for other auctions' requests to join
+                                     # its batch (only with NUM_AUCTIONS > 1)
+
+# Obvious decisions are taken by rule, without the LLM (see quick_decision)
+QUICK_WAIT_BUDGET_FRACTION = 0.8   # WAIT when the price takes more than 80% of the budget
+QUICK_BUY_BUDGET_FRACTION = 0.25   # BUY a missing preferred fish below 25% of the budget
+
+# Thresholds are remembered per situation (see decision_cache_key)
+LLM_CACHE_SIZE = 4096   # Max remembered thresholds (least recently used evicted first)
+
+# Offline analysis runs: LLM thresholds are recorded to and replayed from this
+# JSONL file (one line per situation, see decision_cache_key). With a fixed
+# RANDOM_SEED, a rerun whose situations are all recorded makes no API calls.
+DECISIONS_FILE = os.getenv("LLM_DECISIONS_FILE")  # None = live decisions only
+
 # Simulation Parameters
-NUM_MERCHANTS = 3
+RANDOM_SEED = None            # Seed of the run's np.random.Generator (None = fresh OS entropy)
+NUM_AUCTIONS = 1              # Independent auctions run concurrently (own items and merchants each)
+NUM_MERCHANTS = 3             # Merchants per auction
 FISH_TYPES = ['H', 'S', 'T']  # Hake, Sole, Tuna
-FISH_PER_SESSION = 5          # Number of items to auction
+TYPE_BIT = {t: 1 << i for i, t in enumerate(FISH_TYPES)}  # Bit of each type in an owned-types mask
+# Owned / missing types of every mask, in FISH_TYPES order (for prompts and display)
+OWNED_TYPES = [[t for t in FISH_TYPES if mask & TYPE_BIT[t]] for mask in range(1 << len(FISH_TYPES))]
+MISSING_TYPES = [[t for t in FISH_TYPES if not mask & TYPE_BIT[t]] for mask in range(1 << len(FISH_TYPES))]
+FISH_PER_SESSION = 5          # Number of items to auction (per auction)
 
 # Price Configuration
 START_PRICE_MIN = 40
@@ -86,13 +138,14 @@ MIN_PRICE_MAX = 15
 PRICE_DECREMENT = 5
 
 # Output Configuration
-RESULTS_DIR = "auction_results_langgraph"
-if not os.path.exists(RESULTS_DIR):
-    os.makedirs(RESULTS_DIR)
+RESULTS_DIR = "auction_results_langgraph"  # Created by init_result_files (not on import)
 
 DATE_STR = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 SETUP_CSV = os.path.join(RESULTS_DIR, f"setup_{DATE_STR}.csv")
 LOG_CSV = os.path.join(RESULTS_DIR, f"log_{DATE_STR}.csv")
+LOG_BATCH_SIZE = 64          # Max rows written per flush of the log writer thread
+LOG_FLUSH_INTERVAL = 0.1     # Seconds the writer waits for more rows before flushing a batch
+LOG_HISTORY_SIZE = 1024      # Entries kept in state["logs"] (oldest dropped first)
 
 # ============================================================================
 # PERSONALITIES
@@ -139,13 +192,15 @@ class MerchantState(TypedDict):
     """
     Represents the state of an individual merchant (buyer) agent.
     Maintains their personal inventory, budget, and strategic preferences.
+    Built on demand by Merchants.view() for prompt construction; the
+    authoritative state lives in the Merchants arrays.
     """
     id: str                 # Unique identifier (e.g., "Merchant_1")
     personality: str        # LLM persona (CAUTIOUS, GREEDY, etc.)
     preference: str         # Preferred fish type (H, S, or T)
     budget: float           # Current remaining funds (starts at 100)
     inventory: List[Dict]   # List of items purchased so far
-    types_owned: List[str]  # Set of unique fish types acquired (tracks diversity goal)
+    types_owned: int        # Fish types acquired, as TYPE_BIT bitmask (tracks diversity goal)
 
 class ItemState(TypedDict):
     """
@@ -158,13 +213,40 @@ class ItemState(TypedDict):
     current_price: int      # Price in the current tick/round (updates dynamically)
     status: str             # Current state: 'ACTIVE', 'SOLD', or 'DISCARDED'
 
+@dataclass
+class Merchants:
+    """
+    State of all merchants as parallel per-field arrays (struct-of-arrays),
+    indexed by merchant position. Budgets, preferences and owned types are
+    NumPy arrays, so round-level checks (who can afford the price) are one
+    vectorized operation and a winner is updated by index.
+    """
+    ids: List[str]                # Unique identifiers (e.g., "Merchant_1")
+    personalities: List[str]      # LLM persona of each merchant
+    budgets: np.ndarray           # float64[N] current remaining funds
+    preferences: np.ndarray       # uint8[N] preferred type, as index into FISH_TYPES
+    types_owned_mask: np.ndarray  # uint8[N] owned types as TYPE_BIT bitmask (diversity goal)
+    inventories: List[List[Dict]] # Items purchased so far, per merchant
+    
+    def view(self, i: int) -> MerchantState:
+        """Dict view of merchant i (as used by the LLM prompts and the cache key)."""
+        return {
+            "id": self.ids[i],
+            "personality": self.personalities[i],
+            "preference": FISH_TYPES[self.preferences[i]],
+            "budget": float(self.budgets[i]),
+            "inventory": self.inventories[i],
+            "types_owned": int(self.types_owned_mask[i]),
+        }
+
 class AuctionState(TypedDict):
     """
     Global shared state of the entire auction system.
-    This object is passed between graph nodes (Operator -> Merchants -> Evaluator)
+    This object is passed between the round steps (Operator -> Merchants -> Evaluator)
     and persists changes throughout the simulation.
     """
     # ---- SYSTEM STATUS ----
+    auction_id: int             # Which of the NUM_AUCTIONS concurrent auctions (1-based)
     inventory: List[ItemState]  # Full list of all items to be auctioned
     current_item_index: int     # Pointer to current item in inventory list
     is_auction_active: bool     # True if auction is running, False if finished
@@ -175,30 +257,59 @@ class AuctionState(TypedDict):
     round_messages: List[str]         # Messages generated in this step (for display)
     
     # ---- AGENTS ----
-    merchants: List[MerchantState]    # List of all participating buyer agents
+    merchants: Merchants              # All participating buyer agents (struct-of-arrays)
     bids: Dict[str, str]              # Map of MerchantID -> Decision ('BUY' or 'WAIT')
                                       # Collected during the Merchants node execution
+    max_prices: Dict[str, Dict]       # MerchantID -> {"max_price", "reason"} for the current
+                                      # item (asked once per item; reset by the Operator)
     
     # ---- LOGGING ----
-    logs: List[str]                   # System-wide event log for console output
+    logs: Deque[str]                  # Recent system-wide events, capped at LOG_HISTORY_SIZE
+    
+    # ---- RANDOMNESS ----
+    rng: np.random.Generator          # The run's generator (seeded by RANDOM_SEED); tie-breaks
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
-def create_initial_state() -> AuctionState:
-    """Initialize the auction state with random inventory and merchants."""
+def init_result_files():
+    """Create RESULTS_DIR and the setup and log CSVs (headers only), and start the log writer."""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    try:
+        with open(SETUP_CSV, 'w', newline='') as f:
+            csv.writer(f).writerow(['Merchant', 'Personality', 'Preference', 'Budget'])
+    except Exception as e:
+        print(f"Error creating setup CSV: {e}")
+
+    try:
+        with open(LOG_CSV, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Operator', 'Product', 'Type', 'Sale Price', 'Merchant'])
+        start_log_writer()
+    except Exception as e:
+        print(f"Error creating log CSV: {e}")
+
+def create_initial_state(rng: np.random.Generator, auction_id: int = 1) -> AuctionState:
+    """
+    Initialize the state of one auction with random inventory and merchants
+    (drawn from rng). Product and merchant numbers continue across auctions,
+    so they are unique in the CSV logs.
+    """
+    first_product_id = (auction_id - 1) * FISH_PER_SESSION + 1
+    first_merchant = (auction_id - 1) * NUM_MERCHANTS + 1
+    
+    # 1. Create Inventory (one vectorized draw per field)
+    start_prices = rng.integers(START_PRICE_MIN, START_PRICE_MAX + 1, FISH_PER_SESSION)
+    min_prices = rng.integers(MIN_PRICE_MIN, MIN_PRICE_MAX + 1, FISH_PER_SESSION)
+    types = rng.integers(0, len(FISH_TYPES), FISH_PER_SESSION)
+    start_prices = np.where(start_prices <= min_prices, min_prices + 2 * PRICE_DECREMENT, start_prices)
     
-    # 1. Create Inventory
+    # (tolist: plain Python ints in the item dicts, not NumPy scalars)
     inventory = []
-    for i in range(FISH_PER_SESSION):
-        s_price = random.randint(START_PRICE_MIN, START_PRICE_MAX)
-        m_price = random.randint(MIN_PRICE_MIN, MIN_PRICE_MAX)
-        if s_price <= m_price:
-            s_price = m_price + 2 * PRICE_DECREMENT
-            
+    for i, (s_price, m_price, t) in enumerate(zip(start_prices.tolist(), min_prices.tolist(), types.tolist())):
         inventory.append({
-            "id": i + 1,
-            "type": random.choice(FISH_TYPES),
+            "id": first_product_id + i,
+            "type": FISH_TYPES[t],
             "start_price": s_price,
             "min_price": m_price,
             "current_price": s_price,
@@ -206,43 +317,44 @@ def create_initial_state() -> AuctionState:
         })
 
     # 2. Create Merchants
-    merchants = []
+    ids = []
+    personalities = []
+    preferences = []
+    budgets = []
     personality_names = list(PERSONALITIES.keys())
+    pref_draws = rng.integers(0, len(FISH_TYPES), NUM_MERCHANTS).tolist()
     
     # Setup CSV logging
     try:
-        with open(SETUP_CSV, 'w', newline='') as f:
+        with open(SETUP_CSV, 'a', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow(['Merchant', 'Personality', 'Preference', 'Budget'])
             
             for i in range(NUM_MERCHANTS):
-                m_name = f"Merchant_{i+1}"
+                m_name = f"Merchant_{first_merchant + i}"
                 pers = personality_names[i % len(personality_names)]
-                pref = random.choice(FISH_TYPES)
+                pref = FISH_TYPES[pref_draws[i]]
                 budg = 100.0
                 
-                merchants.append({
-                    "id": m_name,
-                    "personality": pers,
-                    "preference": pref,
-                    "budget": budg,
-                    "inventory": [],
-                    "types_owned": []
-                })
+                ids.append(m_name)
+                personalities.append(pers)
+                preferences.append(FISH_TYPES.index(pref))
+                budgets.append(budg)
                 
                 writer.writerow([m_name, pers, pref, budg])
     except Exception as e:
         print(f"Error creating setup CSV: {e}")
 
-    # Initialize Log CSV
-    try:
-        with open(LOG_CSV, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['Operator', 'Product', 'Type', 'Sale Price', 'Merchant'])
-    except Exception as e:
-        print(f"Error creating log CSV: {e}")
+    merchants = Merchants(
+        ids=ids,
+        personalities=personalities,
+        budgets=np.array(budgets, dtype=np.float64),
+        preferences=np.array(preferences, dtype=np.uint8),
+        types_owned_mask=np.zeros(len(ids), dtype=np.uint8),
+        inventories=[[] for _ in ids],
+    )
 
     return {
+        "auction_id": auction_id,
         "inventory": inventory,
         "current_item_index": 0,
         "is_auction_active": True,
@@ -251,81 +363,621 @@ def create_initial_state() -> AuctionState:
         "round_messages": [],
         "merchants": merchants,
         "bids": {},
-        "logs": ["Auction System Initialized"]
+        "max_prices": {},
+        "logs": deque(["Auction System Initialized"], maxlen=LOG_HISTORY_SIZE),
+        "rng": rng
     }
 
-def call_llm_decision(merchant: MerchantState, item: ItemState, price: float) -> Dict:
-    """Calls the LLM to decide whether to BUY or WAIT."""
+@dataclass
+class LLMRuntime:
+    """
+    Everything the LLM calls share during a run. Built by get_llm_runtime on
+    first use, so importing this module opens no event loop or connection pool.
+    """
+    loop: asyncio.AbstractEventLoop    # Event loop all auctions and requests run on
+    client: httpx.AsyncClient          # Shared HTTP/2 client (bound to loop)
+    semaphore: asyncio.Semaphore       # Requests in flight across all concurrent auctions
+    batcher: "MerchantBatcher"         # Merges concurrent auctions' requests (see collect_llm_max_prices)
+
+@functools.lru_cache(maxsize=1)
+def get_llm_runtime() -> LLMRuntime:
+    """
+    Create the run's LLM runtime (on first use only) and register its cleanup
+    at exit.
     
-    # Construct context for LLM
-    types_missing = [t for t in FISH_TYPES if t not in merchant['types_owned']]
+    One HTTP/2 client for the whole run: every round reuses its keep-alive TLS
+    connection to the provider, and concurrent requests are multiplexed as
+    streams. The client is bound to one event loop, so all rounds run on it.
+    Requests are small JSON bodies, so Nagle's algorithm is disabled on the socket.
+    Compressed responses: httpx advertises and decodes gzip itself, and br once
+    brotli is installed (the httpx[brotli] extra in requirements.txt). No explicit
+    Accept-Encoding is set, so an encoding the client cannot decode is never offered.
+    """
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(
+        headers={
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                                max_connections=LLM_MAX_CONCURRENCY,
+                                keepalive_expiry=LLM_KEEPALIVE_EXPIRY),
+            socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)],
+        ),
+    )
+    
+    @atexit.register
+    def _close_llm_client():
+        """Close the shared client (and its connection) when the program exits."""
+        loop.run_until_complete(client.aclose())
+        loop.close()
+    
+    return LLMRuntime(loop, client, asyncio.Semaphore(LLM_MAX_CONCURRENCY),
+                      MerchantBatcher(LLM_BATCH_WINDOW))
+
+class RateLimiter:
+    """
+    Token bucket for LLM request starts: up to `burst` requests may start at
+    once, and tokens refill at requests_per_minute / 60 per second. Idle time
+    is credited (up to the burst), so the provider's headroom is used instead
+    of a fixed worst-case delay. The bucket lives across rounds.
+    """
+    def __init__(self, requests_per_minute: float, burst: int):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+    
+    async def wait(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+LLM_RATE_LIMITER = RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_RATE_BURST)
+
+# Prompt-cache accounting over the run (reported in the final summary). Usage
+# only arrives with the last event, so answers cut off early are not counted.
+PROMPT_CACHE_STATS = {"prompt_tokens": 0, "cached_tokens": 0}
+
+def record_prompt_usage(usage: Dict):
+    """Add one response's prompt token counts to PROMPT_CACHE_STATS."""
+    PROMPT_CACHE_STATS["prompt_tokens"] += usage.get("prompt_tokens", 0)
+    details = usage.get("prompt_tokens_details") or {}
+    PROMPT_CACHE_STATS["cached_tokens"] += details.get("cached_tokens", 0)
+
+def system_message(prompt: str) -> Dict:
+    """
+    System message marked as a prompt-cache breakpoint. System prompts never
+    contain per-call values, so the provider can reuse their prefill across calls.
+    """
+    return {
+        "role": "system",
+        "content": [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}],
+    }
+
+# Answers are streamed and cut off once the max prices are known (the reasons
+# that follow them do not change the outcome). A number only counts once the
+# character after it has arrived, so it cannot be cut mid-digits.
+# The patterns are also the parser of the (fixed-shape) answers: the max price,
+# and the reason when it arrived whole, are read straight from the text; JSON
+# decoding is only the fallback for answers they do not match.
+_REASON = r'(?:\s*"reason"\s*:\s*("(?:[^"\\]|\\.)*"))?'  # Optional, as a JSON string literal
+MAX_PRICE_PATTERN = re.compile(r'"max_price"\s*:\s*(-?\d+(?:\.\d+)?)\s*[,}]' + _REASON)
+BATCH_MAX_PRICE_PATTERN = re.compile(
+    r'"id"\s*:\s*"([^"]*)"\s*,\s*"max_price"\s*:\s*(-?\d+(?:\.\d+)?)\s*[,}]' + _REASON
+)
+# While streaming, only the new text plus this many characters before it are
+# searched again: more than the longest '"id": ..., "max_price": ...,' prefix
+# a match needs, so one that straddles two deltas is still found
+STREAM_SCAN_OVERLAP = 256
+
+def answer_from_match(price: str, reason: Optional[str]) -> Dict:
+    """{"max_price", "reason"} from the groups of a max-price pattern match."""
+    return {"max_price": float(price),
+            "reason": orjson.loads(reason) if reason else "<truncated>"}
+
+def request_body_parts(system: Dict, response_format: Dict) -> tuple:
+    """
+    Encode the constant JSON of a streamed request once: everything but the
+    user prompt (model, schema, system message, "stream": true).
     
-    system_prompt = PERSONALITIES[merchant['personality']]['system_prompt']
-    user_prompt = f"""Current situation:
-- Fish Type: {item['type']}
-- Current Price: {price}
-- My Budget: {merchant['budget']}
-- My Preference: {merchant['preference']}
-- Types I Own: {merchant['types_owned'] if merchant['types_owned'] else 'None'}
-- Types Missing: {types_missing if types_missing else 'None (I have all types!)'}
-- My Inventory Count: {len(merchant['inventory'])} fish
-- Is Preferred Type: {'YES' if item['type'] == merchant['preference'] else 'NO'}
+    Returns:
+        (prefix, suffix); a request body is prefix + orjson.dumps(user_prompt) + suffix
+    """
+    marker = "\x00USER_PROMPT\x00"
+    body = orjson.dumps({
+        "model": LLM_MODEL,
+        "stream": True,
+        "response_format": response_format,
+        "messages": [system, {"role": "user", "content": marker}],
+    })
+    prefix, suffix = body.split(orjson.dumps(marker))
+    return prefix, suffix
+
+async def stream_llm_content(client: httpx.AsyncClient, body: bytes, enough) -> tuple:
+    """
+    POST a streamed request (body encoded as in request_body_parts) and collect
+    the message content from the server-sent events. Reading stops, and the
+    stream is closed, as soon as enough(content, start) is true; start is where
+    the search has to resume (the new delta plus STREAM_SCAN_OVERLAP characters),
+    so each check costs the size of the delta, not of everything received.
+    
+    Returns:
+        (HTTP status, content received so far, Retry-After header or None)
+    """
+    content = ""
+    async with client.stream("POST", LLM_URL, content=body) as response:
+        if response.status_code != 200:
+            return response.status_code, "", response.headers.get("Retry-After")
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue  # Keep-alive comments and blank separators
+            if line == "data: [DONE]":
+                break
+            chunk = orjson.loads(line[6:])
+            if chunk.get("usage"):
+                record_prompt_usage(chunk["usage"])
+            delta = chunk["choices"][0]["delta"].get("content") if chunk.get("choices") else None
+            if delta:
+                start = max(0, len(content) - STREAM_SCAN_OVERLAP)
+                content += delta
+                if enough(content, start):
+                    break
+    return 200, content, None
+
+_JITTER_RNG = np.random.default_rng()  # Backoff jitter only (deliberately not seeded)
+
+async def request_llm(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                      body: bytes, enough) -> tuple:
+    """
+    Send one streamed LLM request within the concurrency and rate limits.
+    Transient failures (429, 5xx, timeouts and connection errors) are retried
+    up to LLM_MAX_RETRIES times with jittered exponential backoff, or after the
+    delay the provider asks for in Retry-After; only this request waits.
+    
+    Returns:
+        (HTTP status, content) as in stream_llm_content; the last failure
+        (status or exception) once the retries are used up
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        retry_after = None
+        try:
+            async with semaphore:
+                await LLM_RATE_LIMITER.wait()
+                status, content, retry_after = await stream_llm_content(client, body, enough)
+            if status != 429 and status < 500:
+                return status, content
+        except (httpx.TimeoutException, httpx.TransportError):
+            if attempt == LLM_MAX_RETRIES:
+                raise
+        if attempt == LLM_MAX_RETRIES:
+            break
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            # No usable Retry-After (missing, or given as an HTTP date)
+            delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_INITIAL * 2 ** attempt)
+            delay += _JITTER_RNG.uniform(0, delay)
+        await asyncio.sleep(delay)
+    return status, content
+
+# Per-personality system messages and the structured-output schema never
+# change, so they are built once and shared by every request
+SYSTEM_MESSAGES = {name: system_message(p['system_prompt']) for name, p in PERSONALITIES.items()}
+
+LLM_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "auction_max_price",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "max_price": {"type": "number"},
+                "reason": {"type": "string"}
+            },
+            "required": ["max_price", "reason"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Request JSON around the user prompt, per personality (see request_body_parts)
+REQUEST_BODY_PARTS = {name: request_body_parts(message, LLM_RESPONSE_FORMAT)
+                      for name, message in SYSTEM_MESSAGES.items()}
+
+# Per-merchant user prompt; only these fields change between calls. The price
+# is not part of it: the answer covers every price the item will be offered at.
+USER_PROMPT_TEMPLATE = """Current situation:
+- Fish Type: {p_type}
+- Price: starts high and drops by {decrement} every round until someone buys
+- My Budget: {budget}
+- My Preference: {preference}
+- Types I Own: {types_owned}
+- Types Missing: {types_missing}
+- My Inventory Count: {inventory_count} fish
+- Is Preferred Type: {is_preferred}
 
-Should I buy this fish at the current price? Respond with your decision and reasoning."""
+What is the highest price at which I should buy this fish (0 if I should not buy it at all)?
+Respond with the max price first, then your reasoning.""".format
+
+async def call_llm_max_price_async(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                                   merchant: MerchantState, item: ItemState) -> Dict:
+    """
+    Asks the LLM for the highest price at which the merchant buys the item
+    (one merchant, awaited concurrently). The answer is {"max_price", "reason"}.
+    """
+    
+    # Construct context for LLM
+    owned = merchant['types_owned']
+    user_prompt = USER_PROMPT_TEMPLATE(
+        p_type=item['type'],
+        decrement=PRICE_DECREMENT,
+        budget=merchant['budget'],
+        preference=merchant['preference'],
+        types_owned=OWNED_TYPES[owned] if owned else 'None',
+        types_missing=MISSING_TYPES[owned] if MISSING_TYPES[owned] else 'None (I have all types!)',
+        inventory_count=len(merchant['inventory']),
+        is_preferred='YES' if item['type'] == merchant['preference'] else 'NO',
+    )
 
     # API Request
+    prefix, suffix = REQUEST_BODY_PARTS[merchant['personality']]
     try:
-        response = requests.post(
-            LLM_URL,
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": LLM_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "response_format": {
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "auction_decision",
-                        "strict": True,
-                        "schema": {
-                            "type": "object",
-                            "properties": {
-                                "action": {"type": "string", "enum": ["BUY", "WAIT"]},
-                                "reason": {"type": "string"}
-                            },
-                            "required": ["action", "reason"],
-                            "additionalProperties": False
-                        }
-                    }
-                },
-            },
-            timeout=LLM_TIMEOUT
+        status, content = await request_llm(
+            client,
+            semaphore,
+            prefix + orjson.dumps(user_prompt) + suffix,
+            MAX_PRICE_PATTERN.search
         )
         
-        if response.status_code == 200:
-            data = response.json()
-            content = data["choices"][0]["message"]["content"]
-            return json.loads(content)
+        if status == 200:
+            match = MAX_PRICE_PATTERN.search(content)
+            if match is None:
+                return orjson.loads(content)  # Unexpected layout (raises if malformed)
+            return answer_from_match(*match.groups())
         else:
-            return {"action": "WAIT", "reason": f"API Error: {response.status_code}"}
+            return {"max_price": 0.0, "reason": f"API Error: {status}", "error": True}
             
     except Exception as e:
-        return {"action": "WAIT", "reason": f"LLM Exception: {str(e)[:30]}"}
+        return {"max_price": 0.0, "reason": f"LLM Exception: {str(e)[:30]}", "error": True}
+
+# Each merchant keeps its own personality. All of them are listed, not only the
+# ones asked in this request, so the prompt is identical in every request (cacheable).
+BATCH_SYSTEM_PROMPT = """You decide for several merchants in a Dutch fish auction at once.
+Each merchant acts ONLY according to its own personality, described below:
+
+{personas}
+
+Return exactly one answer per merchant id, with its fields in the order id, max_price, reason.
+Keep each reason under {reason_words} words.""".format(
+    personas="\n\n".join(f"[{name}]\n{p['system_prompt']}" for name, p in PERSONALITIES.items()),
+    reason_words=LLM_BATCH_REASON_WORDS,
+)
+
+BATCH_SYSTEM_MESSAGE = system_message(BATCH_SYSTEM_PROMPT)
+
+LLM_BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "auction_batch_max_price",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "decisions": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            "max_price": {"type": "number"},
+                            "reason": {"type": "string"}
+                        },
+                        "required": ["id", "max_price", "reason"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["decisions"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# max_tokens depends on the number of merchants, so it is appended per request
+BATCH_BODY_PREFIX, BATCH_BODY_SUFFIX = request_body_parts(BATCH_SYSTEM_MESSAGE, LLM_BATCH_RESPONSE_FORMAT)
+BATCH_BODY_SUFFIX = BATCH_BODY_SUFFIX[:-1] + b',"max_tokens":%d}'
+
+# Merchants may be bidding in different auctions, so the fish is part of each profile
+BATCH_USER_PROMPT_TEMPLATE = """Current situation:
+- Price: starts high and drops by {decrement} every round until someone buys
+
+Merchants (each with the fish it is bidding on):
+{profiles}
 
-def log_transaction(product_id, product_type, price, merchant_id):
-    """Append a transaction to the CSV log."""
+What is the highest price at which each merchant should buy its fish (0 if it should not buy it at all)?
+Respond with a max price for every merchant.""".format
+
+async def call_llm_batch_max_price(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                                   merchants: List[MerchantState], items: List[ItemState]) -> List[Dict]:
+    """
+    Asks the LLM for the max price of several merchants in ONE request, each
+    for its own item (items[i] is merchants[i]'s). Each merchant is an entry
+    of a JSON array; the answer is {"decisions": [{id, max_price, reason}, ...]}.
+    Results are in merchant order.
+    """
+
+    profiles = [{
+        "id": m['id'],
+        "fish_type": item['type'],
+        "personality": m['personality'],
+        "budget": m['budget'],
+        "preference": m['preference'],
+        "types_owned": OWNED_TYPES[m['types_owned']],
+        "types_missing": MISSING_TYPES[m['types_owned']],
+        "inventory_count": len(m['inventory']),
+        "is_preferred_type": item['type'] == m['preference'],
+    } for m, item in zip(merchants, items)]
+    user_prompt = BATCH_USER_PROMPT_TEMPLATE(
+        decrement=PRICE_DECREMENT,
+        profiles=orjson.dumps(profiles, option=orjson.OPT_INDENT_2).decode(),
+    )
+
+    # Stop reading once every merchant's max price has arrived
+    ids = {m['id'] for m in merchants}
+    seen = set()
+    def all_max_prices_seen(content, start):
+        seen.update(mid for mid, _, _ in BATCH_MAX_PRICE_PATTERN.findall(content, start))
+        return ids <= seen
+
+    # API Request
     try:
-        with open(LOG_CSV, 'a', newline='') as f:
-            writer = csv.writer(f)
-            # Operator ID is 1 for this single-threaded orchestration
-            writer.writerow([1, product_id, product_type, price, merchant_id])
+        status, content = await request_llm(
+            client,
+            semaphore,
+            BATCH_BODY_PREFIX + orjson.dumps(user_prompt)
+            + BATCH_BODY_SUFFIX % (LLM_BATCH_TOKENS_PER_MERCHANT * len(merchants)),
+            all_max_prices_seen
+        )
+
+        if status == 200:
+            by_id = {mid: answer_from_match(max_price, reason)
+                     for mid, max_price, reason in BATCH_MAX_PRICE_PATTERN.findall(content)}
+            if not by_id:
+                # Unexpected layout (raises if malformed)
+                by_id = {d["id"]: d for d in orjson.loads(content)["decisions"]}
+            return [by_id.get(m['id'], {"max_price": 0.0, "reason": "Missing from batch answer", "error": True})
+                    for m in merchants]
+        else:
+            failure = {"max_price": 0.0, "reason": f"API Error: {status}", "error": True}
+
     except Exception as e:
-        print(f"Error logging transaction: {e}")
+        failure = {"max_price": 0.0, "reason": f"LLM Exception: {str(e)[:30]}", "error": True}
+
+    return [failure] * len(merchants)
+
+async def request_max_prices(merchants: List[MerchantState], items: List[ItemState]) -> List[Dict]:
+    """
+    Request the max prices of several merchants (items[i] is merchants[i]'s)
+    on the shared client: a single batched request for the whole group, or the
+    per-merchant call when only one merchant is asked. Results are in merchant order.
+    """
+    runtime = get_llm_runtime()
+    if len(merchants) == 1:
+        return [await call_llm_max_price_async(runtime.client, runtime.semaphore, merchants[0], items[0])]
+    return await call_llm_batch_max_price(runtime.client, runtime.semaphore, merchants, items)
+
+class MerchantBatcher:
+    """
+    Merges the max-price requests of concurrent auctions into one batched
+    request. The first request of a window starts a LLM_BATCH_WINDOW timer;
+    everything asked before it fires is sent together, and each caller gets
+    its own merchants' answers back through futures. Merchant ids are unique
+    across auctions, so the answers map back by id.
+    """
+    def __init__(self, window: float):
+        self.window = window
+        self.pending: List[tuple] = []  # (merchant, item, future)
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks: Set[asyncio.Task] = set()  # Sends in flight (the loop only keeps weak references)
+    
+    async def ask(self, merchants: List[MerchantState], item: ItemState) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in merchants]
+        self.pending.extend(zip(merchants, [item] * len(merchants), futures))
+        if self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return list(await asyncio.gather(*futures))
+    
+    def flush(self):
+        """Send everything pending as one request (timer callback)."""
+        batch, self.pending, self.timer = self.pending, [], None
+        task = asyncio.ensure_future(self.send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    
+    @staticmethod
+    async def send(batch: List[tuple]):
+        merchants, items, futures = zip(*batch)
+        answers = [{"max_price": 0.0, "reason": "LLM request cancelled", "error": True}] * len(batch)
+        try:
+            answers = await request_max_prices(list(merchants), list(items))
+        except Exception as e:
+            answers = [{"max_price": 0.0, "reason": f"LLM Exception: {str(e)[:30]}", "error": True}] * len(batch)
+        finally:
+            # Never leave waiters hanging (e.g. this send was cancelled)
+            for future, answer in zip(futures, answers):
+                if not future.done():
+                    future.set_result(answer)
+
+async def collect_llm_max_prices(merchants: List[MerchantState], item: ItemState) -> List[Dict]:
+    """
+    Max prices of several merchants for the item (results in merchant order).
+    With concurrent auctions the request goes through the runtime's batcher, so requests
+    issued at about the same time share one HTTP round-trip; a single auction
+    sends it right away.
+    """
+    if NUM_AUCTIONS > 1:
+        return await get_llm_runtime().batcher.ask(merchants, item)
+    return await request_max_prices(merchants, [item] * len(merchants))
+
+def quick_decision(merchant: MerchantState, item: ItemState, price: float) -> Optional[str]:
+    """
+    Deterministic pre-classifier for decisions that do not need an LLM.
+    Returns 'BUY' or 'WAIT' for obvious cases, None when the LLM should decide:
+    
+    - WAIT: the price would take more than QUICK_WAIT_BUDGET_FRACTION of the budget
+    - BUY: preferred type, not owned yet, and cheaper than QUICK_BUY_BUDGET_FRACTION
+      of the budget
+    """
+    budget = merchant['budget']
+    if price > QUICK_WAIT_BUDGET_FRACTION * budget:
+        return "WAIT"
+    if (item['type'] == merchant['preference'] and not merchant['types_owned'] & TYPE_BIT[item['type']]
+            and price < QUICK_BUY_BUDGET_FRACTION * budget):
+        return "BUY"
+    return None
+
+# Situation key -> LLM max price, shared by all merchants (the personality is part of the key).
+# Kept in recency order (dicts preserve insertion order): hits move to the end.
+LLM_DECISION_CACHE: Dict[tuple, Dict] = {}
+
+# Situations of the DECISIONS_FILE: the replayed ones plus those decided during
+# this run. Not bounded by LLM_CACHE_SIZE, so nothing recorded is ever lost.
+RECORDED_DECISIONS: Dict[tuple, Dict] = {}
+UNSAVED_DECISIONS: List[tuple] = []  # Keys decided during this run, not in the file yet
+
+def decision_cache_key(merchant: MerchantState, item: ItemState) -> tuple:
+    """
+    Canonical key of the features a max price depends on. The budget is
+    quantized to an integer PRICE_DECREMENT bucket, so budgets that only
+    differ below that granularity (or by float noise) share an entry.
+    """
+    return (merchant['personality'], item['type'],
+            merchant['preference'], merchant['types_owned'],
+            int(merchant['budget'] // PRICE_DECREMENT))
+
+def recall_decision(key: tuple) -> Optional[Dict]:
+    """Cached (marked as recently used) or recorded max price of a situation, or None."""
+    decision = LLM_DECISION_CACHE.pop(key, None)
+    if decision is None:
+        return RECORDED_DECISIONS.get(key)
+    LLM_DECISION_CACHE[key] = decision
+    return decision
+
+def remember_decision(key: tuple, decision: Dict):
+    """Store a fresh LLM max price (and record it with a DECISIONS_FILE), unless the call failed."""
+    if decision.get("error"):
+        return
+    if len(LLM_DECISION_CACHE) >= LLM_CACHE_SIZE:
+        del LLM_DECISION_CACHE[next(iter(LLM_DECISION_CACHE))]  # Evict least recently used entry
+    LLM_DECISION_CACHE[key] = decision
+    if DECISIONS_FILE and key not in RECORDED_DECISIONS:
+        RECORDED_DECISIONS[key] = decision
+        UNSAVED_DECISIONS.append(key)
+
+def load_recorded_decisions(path: str) -> int:
+    """Fill RECORDED_DECISIONS from a DECISIONS_FILE; returns the number of lines read."""
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            entry = orjson.loads(line)
+            RECORDED_DECISIONS[tuple(entry["key"])] = entry["decision"]
+            count += 1
+    return count
+
+def save_recorded_decisions(path: str):
+    """Append the max prices decided during this run to a DECISIONS_FILE."""
+    with open(path, 'ab') as f:
+        for key in UNSAVED_DECISIONS:
+            f.write(orjson.dumps({"key": key, "decision": RECORDED_DECISIONS[key]}) + b"\n")
+    UNSAVED_DECISIONS.clear()
+
+# Transaction rows go through a queue to one writer thread that keeps LOG_CSV
+# open and flushes in batches, so the round steps never wait on file I/O.
+# None in the queue stops the writer.
+LOG_QUEUE: "queue.Queue[Optional[list]]" = queue.Queue()
+
+def _log_writer(f):
+    """Writer thread: drain LOG_QUEUE in batches of up to LOG_BATCH_SIZE rows."""
+    writer = csv.writer(f)
+    with f:
+        while True:
+            row = LOG_QUEUE.get()
+            batch = []
+            try:
+                while row is not None:
+                    batch.append(row)
+                    if len(batch) >= LOG_BATCH_SIZE:
+                        break
+                    row = LOG_QUEUE.get(timeout=LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                pass
+            writer.writerows(batch)
+            f.flush()
+            if row is None:
+                return
+
+def start_log_writer():
+    """Open LOG_CSV for appending and start its writer thread (drained at exit)."""
+    thread = threading.Thread(target=_log_writer, args=(open(LOG_CSV, 'a', newline=''),),
+                              name='log-writer', daemon=True)
+    thread.start()
+    
+    @atexit.register
+    def _stop_log_writer():
+        LOG_QUEUE.put(None)
+        thread.join()
+
+# Round-by-round console output goes through a queue as well: the steps log to
+# `logger`, and a listener thread (set up by main) writes the lines to stdout,
+# so the auction never blocks on console writes
+logger = logging.getLogger("auction")
+
+def log_transaction(auction_id, product_id, product_type, price, merchant_id):
+    """Queue a transaction row for the CSV log."""
+    # Each auction acts as one operator (the auction ID goes in the Operator column)
+    LOG_QUEUE.put([auction_id, product_id, product_type, price, merchant_id])
+
+@njit(cache=True)
+def resolve_round(budgets, types_owned_mask, buy_mask, price, type_bit, min_price, pick):
+    """
+    Deterministic core of a round (compiled): pick the winner among the
+    buyers and charge it, or lower the price / give up on the item.
+    
+    Args:
+        budgets: Merchants.budgets (the winner's entry is updated in place)
+        types_owned_mask: Merchants.types_owned_mask (winner's bit set in place)
+        buy_mask: bool[N], True for merchants that bid BUY
+        price: Current asking price
+        type_bit: TYPE_BIT of the item's fish type
+        min_price: Item's reserve price
+        pick: Uniform draw in [0, 1) choosing among simultaneous buyers
+    
+    Returns:
+        (winner index or -1, next price, True if the auction moves to the next item)
+    """
+    buyers = np.flatnonzero(buy_mask)
+    if buyers.size > 0:
+        # Randomly if multiple simultaneous bids, mimicking race condition
+        winner = buyers[int(pick * buyers.size)]
+        budgets[winner] -= price
+        types_owned_mask[winner] |= type_bit
+        return winner, price, True
+    if price - PRICE_DECREMENT < min_price:
+        return -1, price, True  # Hit bottom price: discard
+    return -1, price - PRICE_DECREMENT, False
 
 # ============================================================================
 # GRAPH NODES
@@ -349,53 +1001,182 @@ def operator_node(state: AuctionState) -> AuctionState:
     if state["current_item"] is None or state["current_item"]["id"] != current_item["id"]:
         state["current_item"] = current_item
         state["current_price"] = current_item["start_price"]
-        logs.append(f"--- NEW ITEM: {current_item['type']} (ID: {current_item['id']}) ---")
-        logs.append(f"Starting Price: {state['current_price']} | Min Price: {current_item['min_price']}")
+        state["max_prices"] = {}
+        logs.append(f"--- NEW ITEM: {current_item['type']} (ID: {current_item['id']}) --- "
+                    f"Starting Price: {state['current_price']} | Min Price: {current_item['min_price']}")
     
     # Broadcast (conceptually)
     state["round_messages"] = [
         f"OPERATOR: Selling {current_item['type']} at {state['current_price']}"
     ]
-    print(f"\n[Operator] Auctioning {current_item['type']} at {state['current_price']}")
+    logger.info(f"\n[Operator] Auctioning {current_item['type']} at {state['current_price']}")
     
     return state
 
-def merchants_node(state: AuctionState) -> AuctionState:
+# Cache key -> answer of the LLM request in flight for it. Concurrent auctions
+# that miss the cache on the same key await that request instead of sending
+# their own (single-flight); entries are removed once the answer is in.
+_inflight: Dict[tuple, asyncio.Future] = {}
+
+async def fetch_max_prices(state: AuctionState, merchants: List[MerchantState]) -> Dict[str, Dict]:
+    """
+    Fill state["max_prices"] for the given merchants: from the cache, from a
+    request another auction already has in flight for the same situation, or
+    else from one batched LLM request (rate limiting is done by request_llm).
+    Merchants in the same situation share one entry: only the first is asked.
+    
+    Returns:
+        Failed answers by merchant id (not kept: those merchants are asked again)
+    """
+    current_item = state["current_item"]
+    max_prices = state["max_prices"]
+    deciding: Dict[tuple, List[MerchantState]] = {}  # Cache key -> merchants waiting on it
+    waiting: Dict[tuple, List[MerchantState]] = {}   # Same, for keys already in _inflight
+    for merchant in merchants:
+        # Same situation seen before: reuse the max price instead of asking again
+        key = decision_cache_key(merchant, current_item)
+        cached = recall_decision(key)
+        if cached is not None:
+            max_prices[merchant["id"]] = {"max_price": cached.get("max_price", 0.0), "reason": "cached"}
+        elif key in _inflight:
+            waiting.setdefault(key, []).append(merchant)
+        else:
+            deciding.setdefault(key, []).append(merchant)
+    
+    # Registered before the first await, so auctions running meanwhile find them
+    loop = asyncio.get_running_loop()
+    for key in deciding:
+        _inflight[key] = loop.create_future()
+    futures = {key: _inflight[key] for key in waiting}
+    
+    answered: List[tuple] = []  # (answer, merchants it applies to)
+    if deciding:
+        try:
+            answers = await collect_llm_max_prices([group[0] for group in deciding.values()], current_item)
+        except BaseException as e:
+            # Never leave waiters hanging (e.g. this auction was cancelled)
+            answers = [{"max_price": 0.0, "reason": f"LLM Exception: {str(e)[:30]}", "error": True}] * len(deciding)
+            raise
+        finally:
+            for key, answer in zip(deciding, answers):
+                _inflight.pop(key).set_result(answer)
+        for (key, group), answer in zip(deciding.items(), answers):
+            remember_decision(key, answer)
+            answered.append((answer, group))
+    for key, group in waiting.items():
+        answered.append((await futures[key], group))
+    
+    failures = {}
+    for answer, group in answered:
+        for merchant in group:
+            if answer.get("error"):
+                failures[merchant["id"]] = answer
+            else:
+                max_prices[merchant["id"]] = answer
+    return failures
+
+def price_schedule(start_price: int, min_price: int) -> np.ndarray:
+    """Every price an item is offered at, from start_price down to the last one >= min_price."""
+    return np.arange(start_price, min_price - 1, -PRICE_DECREMENT)
+
+async def plan_item(state: AuctionState):
+    """
+    Start of an item: the whole price schedule is known, and merchant state
+    cannot change until the item is sold, so every round's decisions follow
+    from the rules and the max prices. All max prices the item can need are
+    fetched at once, the first round with a buyer is found with one
+    vectorized comparison [merchant x round], and the price jumps there.
+    The rounds in between (nobody buys) are skipped. If an answer failed,
+    nothing is skipped and the rounds are played one by one.
+    """
+    item = state["current_item"]
+    merchants = state["merchants"]
+    prices = price_schedule(item["start_price"], item["min_price"])
+    
+    # Same rules as quick_decision, for all merchants and rounds at once
+    budgets = merchants.budgets[:, None]
+    in_range = prices <= QUICK_WAIT_BUDGET_FRACTION * budgets  # Not an obvious WAIT
+    wants = ((merchants.preferences == FISH_TYPES.index(item["type"]))
+             & (merchants.types_owned_mask & TYPE_BIT[item["type"]] == 0))
+    quick_buy = wants[:, None] & (prices < QUICK_BUY_BUDGET_FRACTION * budgets)
+    
+    # Max prices of the merchants that reach a round the rules do not decide
+    needs = (in_range & ~quick_buy).any(axis=1)
+    if await fetch_max_prices(state, [merchants.view(i) for i in np.flatnonzero(needs)]):
+        return
+    max_price = np.array([state["max_prices"][mid]["max_price"] if needs[i] else -np.inf
+                          for i, mid in enumerate(merchants.ids)])
+    
+    buys = in_range & (quick_buy | (prices <= max_price[:, None]))
+    rounds_with_buyer = np.flatnonzero(buys.any(axis=0))
+    # No buyer at all: go to the last round (the Evaluator discards the item)
+    first = rounds_with_buyer[0] if rounds_with_buyer.size else len(prices) - 1
+    if first > 0:
+        msg = f"No bids from {prices[0]} down to {prices[first - 1]}: skipping to {prices[first]}"
+        state["logs"].append(msg)
+        logger.info(f"[Operator] {msg}")
+        state["current_price"] = int(prices[first])
+
+async def merchants_node(state: AuctionState) -> AuctionState:
     """
     MERCHANTS NODE: Collects decisions from all merchants for the current price.
-    In a real distributed system, these would run in parallel.
-    Here we iterate through them to simulate the concurrent decision phase.
+    In a Dutch auction a merchant's choice reduces to the highest price it would
+    pay for the item, so the LLM is asked for that once per item (all merchants
+    in one batched request) and every round is a comparison against it.
     """
     if not state["is_auction_active"]:
         return state
         
     current_item = state["current_item"]
     price = state["current_price"]
+    max_prices = state["max_prices"]
     bids = {}
     
-    # Each merchant makes a decision
-    for merchant in state["merchants"]:
+    # Budget check, rules and known max prices first; the rest are fetched all at once
+    merchants = state["merchants"]
+    affordable = merchants.budgets >= price
+    asking = []
+    decided = []
+    for i, merchant_id in enumerate(merchants.ids):
         # Skip if budget insufficient
-        if merchant["budget"] < price:
-            bids[merchant["id"]] = "WAIT"
-            print(f"  > {merchant['id']} ({merchant['personality']}): WAIT | Insufficient budget ({merchant['budget']} < {price})")
+        if not affordable[i]:
+            bids[merchant_id] = "WAIT"
+            logger.info(f"  > {merchant_id} ({merchants.personalities[i]}): WAIT | Insufficient budget ({merchants.budgets[i]} < {price})")
             continue
-            
-        # Call LLM for decision
-        decision = call_llm_decision(merchant, current_item, price)
-        action = decision.get("action", "WAIT")
-        reason = decision.get("reason", "Unknown")
+        
+        merchant = merchants.view(i)
+        # Obvious cases are decided by rule
+        quick = quick_decision(merchant, current_item, price)
+        if quick is not None:
+            decided.append((merchant, quick, "Rule-based (obvious case)"))
+            continue
+        
+        # Max price for this item already known (merchants do not change during an item)
+        if merchant_id not in max_prices:
+            asking.append(merchant)
+        decided.append((merchant, None, None))
+    
+    failures = await fetch_max_prices(state, asking) if asking else {}
+    
+    for merchant, action, reason in decided:
+        if action is None:
+            failure = failures.get(merchant["id"])
+            if failure is not None:
+                action, reason = "WAIT", failure.get("reason", "Unknown")
+            else:
+                # Buy once the price has dropped to the merchant's max price
+                answer = max_prices[merchant["id"]]
+                max_price = answer.get("max_price", 0.0)
+                action = "BUY" if price <= max_price else "WAIT"
+                reason = f"{answer.get('reason', 'Unknown')} (max {max_price})"
         
         bids[merchant["id"]] = action
         
         # Log decision with reason
-        print(f"  > {merchant['id']} ({merchant['personality']}): {action} | {reason}")
-        
-        # Respect API rate limits (avoid 429) - very conservative for free tier
-        time.sleep(20.0)
+        logger.info(f"  > {merchant['id']} ({merchant['personality']}): {action} | {reason}")
     
     state["bids"] = bids
-    print(f"  [Bids] {bids}")
+    logger.info(f"  [Bids] {bids}")
     return state
 
 def evaluator_node(state: AuctionState) -> AuctionState:
@@ -410,28 +1191,25 @@ def evaluator_node(state: AuctionState) -> AuctionState:
     current_item = state["current_item"]
     price = state["current_price"]
     
-    # 1. Check for Buyers
-    buyers = [mid for mid, action in bids.items() if action == "BUY"]
+    merchants = state["merchants"]
     
-    if buyers:
+    # 1. Check for Buyers, pick a winner and charge it (or lower the price)
+    buy_mask = np.array([bids.get(mid) == "BUY" for mid in merchants.ids], dtype=np.bool_)
+    winner, next_price, advance = resolve_round(
+        merchants.budgets, merchants.types_owned_mask, buy_mask, price,
+        TYPE_BIT[current_item["type"]], current_item["min_price"], state["rng"].random()
+    )
+    
+    if winner >= 0:
         # SOLD!
-        # Pick a winner (randomly if multiple simultaneous bids, mimicking race condition)
-        winner_id = random.choice(buyers)
-        
-        # Process Transaction
-        for m in state["merchants"]:
-            if m["id"] == winner_id:
-                m["budget"] -= price
-                m["inventory"].append(current_item)
-                if current_item["type"] not in m["types_owned"]:
-                    m["types_owned"].append(current_item["type"])
-                break
+        winner_id = merchants.ids[winner]
+        merchants.inventories[winner].append(current_item)
         
         # Log
         msg = f"SOLD {current_item['type']} to {winner_id} for {price}"
         state["logs"].append(msg)
-        print(f"[Evaluator] {msg}")
-        log_transaction(current_item['id'], current_item['type'], price, winner_id)
+        logger.info(f"[Evaluator] {msg}")
+        log_transaction(state["auction_id"], current_item['id'], current_item['type'], price, winner_id)
         
         # Move to next item
         state["current_item_index"] += 1
@@ -441,12 +1219,12 @@ def evaluator_node(state: AuctionState) -> AuctionState:
     else:
         # NO SALE
         # Check if we hit bottom price
-        if price - PRICE_DECREMENT < current_item["min_price"]:
+        if advance:
             # Discard Item
             msg = f"DISCARDED {current_item['type']} (Price {price} -> Min {current_item['min_price']})"
             state["logs"].append(msg)
-            print(f"[Evaluator] {msg}")
-            log_transaction(current_item['id'], current_item['type'], 0, "")
+            logger.info(f"[Evaluator] {msg}")
+            log_transaction(state["auction_id"], current_item['id'], current_item['type'], 0, "")
             
             # Move to next item
             state["current_item_index"] += 1
@@ -454,50 +1232,85 @@ def evaluator_node(state: AuctionState) -> AuctionState:
             state["bids"] = {}
         else:
             # Continue Auction: Decrease Price
-            state["current_price"] -= PRICE_DECREMENT
+            state["current_price"] = next_price
             # Stay on same item
     
     return state
 
+async def auction_node(state: AuctionState) -> AuctionState:
+    """
+    AUCTION NODE: Runs the whole auction, round after round
+    (Operator -> Merchants -> Evaluator) until the Operator finds no item left.
+    Each item is planned first (see plan_item), so rounds nobody bids in are skipped.
+    """
+    while True:
+        operator_node(state)
+        if not state["is_auction_active"]:
+            return state
+        if state["current_price"] == state["current_item"]["start_price"]:
+            await plan_item(state)  # First round of a new item
+        await merchants_node(state)
+        evaluator_node(state)
+
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
+@functools.lru_cache(maxsize=1)
+def get_app():
+    """Build and compile the auction graph (on first use only, not on import)."""
+    workflow = StateGraph(AuctionState)
+    
+    workflow.add_node("auction", auction_node)
+    
+    workflow.add_edge(START, "auction")
+    workflow.add_edge("auction", END)
+    
+    # No checkpointer: the node mutates the state in place and nothing is
+    # snapshotted (the run is never resumed)
+    return workflow.compile(checkpointer=None)
+
 def main():
     print("="*60)
     print("LANGGRAPH FISH AUCTION SYSTEM")
     print("="*60)
     
     # 1. Build Graph
-    workflow = StateGraph(AuctionState)
-    
-    workflow.add_node("operator", operator_node)
-    workflow.add_node("merchants", merchants_node)
-    workflow.add_node("evaluator", evaluator_node)
-    
-    workflow.add_edge(START, "operator")
-    workflow.add_edge("operator", "merchants")
-    workflow.add_edge("merchants", "evaluator")
-    
-    # Conditional Logic for Next Step
-    def next_step(state: AuctionState):
-        if not state["is_auction_active"]:
-            return END
-        return "operator"
-        
-    workflow.add_conditional_edges("evaluator", next_step)
-    
-    app = workflow.compile()
+    app = get_app()
     
     # 2. Run Simulation
-    print(f"Initializing {NUM_MERCHANTS} merchants and {FISH_PER_SESSION} items...")
-    initial_state = create_initial_state()
+    if DECISIONS_FILE:
+        print(f"Replaying {load_recorded_decisions(DECISIONS_FILE)} recorded decisions from {DECISIONS_FILE}")
+    
+    print(f"Initializing {NUM_AUCTIONS} auction(s) with {NUM_MERCHANTS} merchants and {FISH_PER_SESSION} items each...")
+    init_result_files()
+    # One independent generator per auction, all derived from RANDOM_SEED
+    seeds = np.random.SeedSequence(RANDOM_SEED).spawn(NUM_AUCTIONS)
+    initial_states = [create_initial_state(np.random.default_rng(seed), auction_id)
+                      for auction_id, seed in enumerate(seeds, start=1)]
     
     print(f"Logs will be saved to: {RESULTS_DIR}")
     
-    # Execute Graph
-    # We use stream to see progress, but for simplicity invoke is fine.
-    # Given the potentially long execution time, we'll just run it.
-    final_state = app.invoke(initial_state, config={"recursion_limit": 150})
+    # Execute Graph: every auction is one ainvoke, all awaited together on
+    # the LLM runtime's loop (the shared client's), so their LLM waits overlap
+    async def run_auctions():
+        return await asyncio.gather(*(
+            app.ainvoke(state) for state in initial_states
+        ))
+    console_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    console_handler = logging.handlers.QueueHandler(console_queue)
+    console_listener = logging.handlers.QueueListener(console_queue, logging.StreamHandler(sys.stdout))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(console_handler)
+    console_listener.start()
+    try:
+        final_states = get_llm_runtime().loop.run_until_complete(run_auctions())
+    finally:
+        console_listener.stop()  # Writes out the queued lines before the summary
+        logger.removeHandler(console_handler)
+    
+    if DECISIONS_FILE:
+        save_recorded_decisions(DECISIONS_FILE)
     
     print("\n" + "="*60)
     print("AUCTION COMPLETED")
@@ -505,8 +1318,14 @@ def main():
     
     # 3. Final Summary
     print("\nFinal Merchant Status:")
-    for m in final_state["merchants"]:
-        print(f"- {m['id']} ({m['personality']}): Budget {m['budget']}, Items: {len(m['inventory'])}, Types: {m['types_owned']}")
+    for merchants in (final_state["merchants"] for final_state in final_states):
+        for m in (merchants.view(i) for i in range(len(merchants.ids))):
+            print(f"- {m['id']} ({m['personality']}): Budget {m['budget']}, Items: {len(m['inventory'])}, Types: {OWNED_TYPES[m['types_owned']]}")
+    
+    prompt_tokens = PROMPT_CACHE_STATS["prompt_tokens"]
+    if prompt_tokens:
+        cached = PROMPT_CACHE_STATS["cached_tokens"]
+        print(f"\nPrompt cache: {cached}/{prompt_tokens} prompt tokens cached ({100 * cached / prompt_tokens:.0f}%)")
 
 if __name__ == "__main__":
     main()